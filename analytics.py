@@ -0,0 +1,419 @@
+import bisect
+import calendar
+import functools
+import heapq
+from datetime import date, timedelta
+
+SECONDS_PER_DAY = 86400
+# Day 0 of the check-in timestamps (see storage.EPOCH).
+EPOCH_DATE = date(1970, 1, 1)
+
+####################################
+# Streak rules
+####################################
+# A streak is a run of check-ins where every check follows the previous one
+# within the habit's period: exactly the next day for daily habits, at most
+# seven days later for weekly ones. The current streak is the run that ends
+# at the latest check-in.
+
+def continues_streak(period, prev_ts, ts):
+    """True if a check at ts extends a streak whose latest check is at prev_ts."""
+    diff = (ts - prev_ts) // SECONDS_PER_DAY
+    if period == "daily":
+        return diff == 1
+    if period == "weekly":
+        return diff <= 7
+    return False
+
+
+def compute_streak(period, logs):
+    """
+    Build the streak record of a habit from its sorted logs:
+    current streak, when it started, last check and longest-ever streak.
+    Returns None for a habit without check-ins.
+    """
+    if not logs:
+        return None
+    current = longest = 1
+    start = logs[0]
+    for i in range(1, len(logs)):
+        if continues_streak(period, logs[i - 1], logs[i]):
+            current += 1
+        else:
+            current = 1
+            start = logs[i]
+        if current > longest:
+            longest = current
+    return {"current": current, "start": start, "last": logs[-1], "longest": longest}
+
+
+def streak_runs(period, logs):
+    """Every streak in sorted logs, oldest first, as (first check, last check, length) tuples."""
+    runs = []
+    for i, ts in enumerate(logs):
+        if i and continues_streak(period, logs[i - 1], ts):
+            start, _, length = runs[-1]
+            runs[-1] = (start, ts, length + 1)
+        else:
+            runs.append((ts, ts, 1))
+    return runs
+
+
+def extend_streak(record, period, ts):
+    """
+    Update a streak record in place for a new check at ts, which must not be
+    older than record["last"]. Returns the record.
+    """
+    if continues_streak(period, record["last"], ts):
+        record["current"] += 1
+    else:
+        record["current"] = 1
+        record["start"] = ts
+    record["last"] = ts
+    if record["current"] > record["longest"]:
+        record["longest"] = record["current"]
+    return record
+
+
+####################################
+# Bulk streak engine
+####################################
+# NumPy is optional and imported on first use: importing it costs more than
+# the pure-Python engine needs for small histories.
+NUMPY_MIN_CHECKINS = 20000
+_numpy = None
+
+
+def load_numpy():
+    """The numpy module, or None if it isn't installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def compute_streaks(habit_logs):
+    """
+    Build streak records for many habits at once. habit_logs maps a habit
+    name to a (period, sorted logs) pair; habits without logs are skipped.
+    Uses the vectorized NumPy engine for large inputs when NumPy is installed.
+    """
+    total = sum(len(logs) for _, logs in habit_logs.values())
+    if total < NUMPY_MIN_CHECKINS or load_numpy() is None:
+        return compute_streaks_python(habit_logs)
+    return compute_streaks_numpy(habit_logs)
+
+
+def compute_streaks_python(habit_logs):
+    return {
+        name: compute_streak(period, logs)
+        for name, (period, logs) in habit_logs.items() if len(logs)
+    }
+
+
+def compute_streaks_numpy(habit_logs):
+    """
+    Vectorized equivalent of compute_streaks_python. All logs are
+    concatenated into one int64 array; a run-length pass over the day gaps
+    splits it into streaks, which are then reduced per habit.
+    """
+    np = load_numpy()
+    names = [name for name, (_, logs) in habit_logs.items() if len(logs)]
+    if not names:
+        return {}
+    # array('q') logs are wrapped without copying.
+    arrays = [np.asarray(habit_logs[name][1], dtype=np.int64) for name in names]
+    lengths = np.array([len(a) for a in arrays])
+    habit_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    flat = np.concatenate(arrays)
+
+    # Whether each check continues the streak of the check before it.
+    gaps = np.diff(flat) // SECONDS_PER_DAY
+    periods = np.repeat([habit_logs[name][0] for name in names], lengths)[1:]
+    continues = np.where(periods == "daily", gaps == 1, (periods == "weekly") & (gaps <= 7))
+    # The first check of every habit always starts a new streak.
+    continues[habit_starts[1:] - 1] = False
+
+    run_starts = np.flatnonzero(np.concatenate(([True], ~continues)))
+    run_lengths = np.diff(np.append(run_starts, len(flat)))
+    first_run = np.searchsorted(run_starts, habit_starts)
+    last_run = np.append(first_run[1:], len(run_starts)) - 1
+    longest = np.maximum.reduceat(run_lengths, first_run)
+    habit_ends = habit_starts + lengths - 1
+
+    return {
+        name: {
+            "current": int(run_lengths[last_run[i]]),
+            "start": int(flat[run_starts[last_run[i]]]),
+            "last": int(flat[habit_ends[i]]),
+            "longest": int(longest[i])
+        }
+        for i, name in enumerate(names)
+    }
+
+
+####################################
+# Rollups
+####################################
+# Per-habit check-in counts per day ("2024-03-05"), ISO week ("2024-W10")
+# and month ("2024-03"), maintained on every write so that long-horizon
+# reports read a few buckets instead of every timestamp. Years are summed
+# from the month buckets.
+ROLLUP_GRANULARITIES = ("day", "week", "month")
+REPORT_GRANULARITIES = ROLLUP_GRANULARITIES + ("year",)
+
+
+def empty_rollup():
+    return {granularity: {} for granularity in ROLLUP_GRANULARITIES}
+
+
+def bucket_keys(ts):
+    """The day, ISO week and month bucket of a check-in timestamp."""
+    return day_bucket_keys(ts // SECONDS_PER_DAY)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def day_bucket_keys(day):
+    # Histories share their days, so bulk rollups mostly hit the cache.
+    return date_bucket_keys(EPOCH_DATE + timedelta(days=day))
+
+
+def date_bucket_keys(d):
+    year, week, _ = d.isocalendar()
+    return d.isoformat(), f"{year}-W{week:02d}", f"{d.year}-{d.month:02d}"
+
+
+def add_to_rollup(rollup, keys, count):
+    """Add count (negative to remove) check-ins to the buckets in keys; empty buckets are dropped."""
+    for granularity, key in zip(ROLLUP_GRANULARITIES, keys):
+        buckets = rollup[granularity]
+        total = buckets.get(key, 0) + count
+        if total > 0:
+            buckets[key] = total
+        else:
+            buckets.pop(key, None)
+
+
+def compute_rollup(logs):
+    """Build the rollup of a habit from its sorted logs, one bucket lookup per distinct day."""
+    rollup = empty_rollup()
+    days, weeks, months = (rollup[g] for g in ROLLUP_GRANULARITIES)
+    i = 0
+    while i < len(logs):
+        day = logs[i] // SECONDS_PER_DAY
+        j = bisect.bisect_left(logs, (day + 1) * SECONDS_PER_DAY, i)
+        day_key, week_key, month_key = day_bucket_keys(day)
+        days[day_key] = j - i
+        weeks[week_key] = weeks.get(week_key, 0) + j - i
+        months[month_key] = months.get(month_key, 0) + j - i
+        i = j
+    return rollup
+
+
+def rollup_counts(rollup, granularity):
+    """Bucket -> check-ins for one granularity, including years summed from months."""
+    if granularity != "year":
+        return rollup[granularity]
+    years = {}
+    for month, count in rollup["month"].items():
+        years[month[:4]] = years.get(month[:4], 0) + count
+    return years
+
+
+def recent_buckets(granularity, today, count):
+    """Keys of the count most recent buckets up to today, oldest first, with their length in days."""
+    buckets = []
+    d = today
+    while len(buckets) < count:
+        if granularity == "day":
+            key, days, step = d.isoformat(), 1, d - timedelta(days=1)
+        elif granularity == "week":
+            key, days = date_bucket_keys(d)[1], 7
+            step = d - timedelta(days=7)
+        elif granularity == "month":
+            key, days = date_bucket_keys(d)[2], calendar.monthrange(d.year, d.month)[1]
+            step = d.replace(day=1) - timedelta(days=1)
+        else:
+            key, days = str(d.year), 366 if calendar.isleap(d.year) else 365
+            step = d.replace(month=1, day=1) - timedelta(days=1)
+        buckets.append((key, days))
+        d = step
+    return buckets[::-1]
+
+
+def completion(period, count, days):
+    """Share (0-100) of the check-ins a habit of the given periodicity needs in a bucket of days."""
+    expected = days if period == "daily" else max(days / 7, 1)
+    return min(100.0, 100.0 * count / expected)
+
+
+####################################
+# Due times
+####################################
+# A habit becomes pending at its next due time: the midnight after its
+# last check for daily habits, eight days after the day of its last check
+# for weekly ones, and immediately if it was never checked.
+
+def next_due(period, last_ts):
+    """Timestamp at which a habit checked last at last_ts becomes pending, or None if never."""
+    if last_ts is None:
+        return 0
+    day = last_ts // SECONDS_PER_DAY
+    if period == "daily":
+        return (day + 1) * SECONDS_PER_DAY
+    if period == "weekly":
+        return (day + 8) * SECONDS_PER_DAY
+    return None
+
+
+class DueQueue:
+    """
+    Min-heap of habits keyed by their next due time. Updates push a new
+    entry and leave the old one in the heap; stale entries are skipped
+    when they surface, so every operation is O(log n).
+    """
+
+    def __init__(self):
+        self.heap = []
+        # name -> (due, periodicity) of the live entry
+        self.entries = {}
+
+    @classmethod
+    def build(cls, habits, streaks):
+        """Build the queue from the habits and their cached streak records (for the last check)."""
+        queue = cls()
+        for name, habit in habits.items():
+            record = streaks.get(name)
+            due = next_due(habit.get("periodicity"), record["last"] if record else None)
+            if due is not None:
+                queue.entries[name] = (due, habit.get("periodicity"))
+                queue.heap.append((due, name))
+        heapq.heapify(queue.heap)
+        return queue
+
+    def update(self, name, period, last_ts):
+        due = next_due(period, last_ts)
+        if due is None:
+            self.remove(name)
+            return
+        old = self.entries.get(name)
+        self.entries[name] = (due, period)
+        if not old or old[0] != due:
+            heapq.heappush(self.heap, (due, name))
+
+    def remove(self, name):
+        self.entries.pop(name, None)
+
+    def _live_top(self):
+        while self.heap:
+            due, name = self.heap[0]
+            entry = self.entries.get(name)
+            if entry and entry[0] == due:
+                return due, name
+            heapq.heappop(self.heap)
+        return None
+
+    def next_due(self, after=None):
+        """The earliest due time in the queue (later than after, if given), or None."""
+        popped = self._pop_due(after) if after is not None else []
+        top = self._live_top()
+        self._push_back(popped)
+        return top[0] if top else None
+
+    def pending(self, now):
+        """(name, periodicity) of the habits due at or before now, most overdue first."""
+        popped = self._pop_due(now)
+        self._push_back(popped)
+        result = []
+        seen = set()
+        for _, name in popped:
+            # A habit moved away and back to the same due time has two entries.
+            if name not in seen:
+                seen.add(name)
+                result.append((name, self.entries[name][1]))
+        return result
+
+    def _pop_due(self, now):
+        popped = []
+        while True:
+            top = self._live_top()
+            if top is None or top[0] > now:
+                return popped
+            popped.append(heapq.heappop(self.heap))
+
+    def _push_back(self, popped):
+        for item in popped:
+            heapq.heappush(self.heap, item)
+
+
+####################################
+# Synthetic histories
+####################################
+# `fill` generates streaky check-in histories for demos and load tests.
+# Each habit alternates between runs of checked and skipped periods whose
+# lengths are drawn from geometric distributions (a two-state Markov chain),
+# tuned so that on average `density` of the periods are checked. Drawing run
+# lengths instead of one coin per day keeps generation proportional to the
+# number of check-ins, and rows come out oldest first per habit, so bulk
+# imports never need to re-sort them.
+SAMPLE_HABITS = [
+    ("Workout", "daily"),
+    ("ReadBook", "daily"),
+    ("WaterPlants", "daily"),
+    ("GuitarPractice", "daily"),
+    ("WeeklyGrocery", "weekly"),
+    ("PayBills", "weekly"),
+]
+
+
+def synthetic_habits(count):
+    """(name, periodicity) of count habits: the sample habits, then Habit7, Habit8, ... (every fourth weekly)."""
+    habits = SAMPLE_HABITS[:count]
+    for n in range(len(habits) + 1, count + 1):
+        habits.append((f"Habit{n}", "weekly" if n % 4 == 0 else "daily"))
+    return habits
+
+
+def synthetic_checkins(habits, days, density, seed=None, today=None):
+    """
+    Yield (habit, periodicity, ts) rows for the given (name, periodicity)
+    habits over the `days` days before today. The same seed always yields
+    the same history for the same today.
+    """
+    import math
+    import random
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = (today - EPOCH_DATE).days - days
+
+    def run_length(p_end):
+        # Geometric number of periods until the run ends with probability p_end.
+        if p_end >= 1:
+            return 1
+        return 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - p_end))
+
+    for name, period in habits:
+        step = 7 if period == "weekly" else 1
+        periods = max(1, days // step)
+        # Each habit gets its own rhythm: a typical streak length and a
+        # preferred hour of the day to check in.
+        p_stop = 1.0 / rng.uniform(3, 15)
+        p_start = p_stop * density / (1.0 - density) if density < 1 else 1.0
+        if p_start > 1:
+            p_start, p_stop = 1.0, (1.0 - density) / density
+        base = first_day * SECONDS_PER_DAY + rng.randrange(6, 22) * 3600
+        offset = rng.randrange(step)
+
+        p = 0
+        checked = rng.random() < density
+        while p < periods:
+            run = run_length(p_stop if checked else p_start)
+            if checked:
+                for k in range(p, min(p + run, periods)):
+                    yield name, period, base + (k * step + offset) * SECONDS_PER_DAY + int(rng.random() * 3600)
+            p += run
+            checked = not checked
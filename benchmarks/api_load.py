@@ -0,0 +1,88 @@
+"""
+Load test for the HCLI HTTP API.
+
+Start the API first (python main.py api), then run e.g.:
+
+    python benchmarks/api_load.py --requests 5000 --concurrency 50
+
+Each client keeps one HTTP/1.1 connection open and sends a mix of reads
+(streaks, summary, reminder, details) and check-ins to a test habit.
+Prints requests/sec and latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+HABIT = "api-load-test"
+
+READS = [("GET", "/streaks"), ("GET", "/summary"), ("GET", "/reminder"), ("GET", f"/habits/{HABIT}")]
+WRITE = ("POST", f"/habits/{HABIT}/check")
+
+
+async def request(reader, writer, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode().partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(args, count, latencies, errors):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        for i in range(count):
+            method, path = WRITE if args.write_ratio and i % args.write_ratio == 0 else READS[i % len(READS)]
+            start = time.perf_counter()
+            status = await request(reader, writer, method, path, {} if method == "POST" else None)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def main(args):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    await request(reader, writer, "POST", "/habits", {"name": HABIT, "periodicity": "daily"})
+    writer.close()
+
+    per_client = [args.requests // args.concurrency] * args.concurrency
+    for i in range(args.requests % args.concurrency):
+        per_client[i] += 1
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args, n, latencies, errors) for n in per_client))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"{len(latencies)} requests, {args.concurrency} connections in {elapsed:.2f}s")
+    print(f"{len(latencies) / elapsed:.0f} requests/sec")
+    print(f"latency ms: p50 {pct(0.50):.2f}  p90 {pct(0.90):.2f}  p99 {pct(0.99):.2f}  max {latencies[-1] * 1000:.2f}")
+    if errors:
+        print(f"{len(errors)} error responses")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--write-ratio", type=int, default=10,
+                        help="Every Nth request is a check-in (0 for reads only).")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+JSON codec benchmark: save/load throughput of the JSON snapshot per codec.
+
+    python benchmarks/json_codecs.py --checkins 1000000 --runs 3
+
+A dataset with about --checkins check-ins from the `fill` generator is
+saved and loaded with every installed codec (orjson, msgspec, the json
+module), compact and pretty-printed, each in a throwaway directory. Load
+times include decoding the ISO timestamps and rebuilding the caches, as
+load_data does; "codec only" times just dumps()/loads() of the encoded
+snapshot. The binary snapshot format is timed alongside for reference.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rich.console import Console  # noqa: E402
+import codec  # noqa: E402
+from analytics import synthetic_checkins, synthetic_habits  # noqa: E402
+from storage import BinaryStorage, JsonStorage, encode_logs  # noqa: E402
+
+HABITS = 20
+DENSITY = 0.7
+
+
+def make_data(checkins):
+    """The dataset as loaded by the json backend, with roughly the given number of check-ins."""
+    with tempfile.TemporaryDirectory() as root:
+        storage = JsonStorage(os.path.join(root, "habits.json"), os.path.join(root, "journal"), Console())
+        habits = synthetic_habits(HABITS)
+        weekly = sum(1 for _, period in habits if period == "weekly")
+        days = round(checkins / (DENSITY * (len(habits) - weekly + weekly / 7)))
+        storage.import_checkins(synthetic_checkins(habits, days, DENSITY, seed=0))
+        return storage.data
+
+
+def time_codec_only(snapshot, pretty, runs):
+    """Median (dumps, loads) seconds of the encoded snapshot, without file I/O or ISO conversion."""
+    dumps, loads = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        raw = codec.dumps(snapshot, pretty)
+        dumps.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        codec.loads(raw)
+        loads.append(time.perf_counter() - start)
+    return statistics.median(dumps), statistics.median(loads)
+
+
+def time_codec(data, storage_class, pretty, runs):
+    """Median (save, load) seconds and the file size."""
+    saves, loads = [], []
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "habits." + ("bin" if storage_class is BinaryStorage else "json"))
+        for _ in range(runs):
+            storage = storage_class(path, path + ".journal", Console())
+            storage.pretty = pretty
+            start = time.perf_counter()
+            storage.import_data(data)
+            saves.append(time.perf_counter() - start)
+
+            storage = storage_class(path, path + ".journal", Console())
+            start = time.perf_counter()
+            storage.load()
+            loads.append(time.perf_counter() - start)
+        size = os.path.getsize(path)
+    return statistics.median(saves), statistics.median(loads), size
+
+
+def main(args):
+    data = make_data(args.checkins)
+    snapshot = encode_logs(data)
+    total = sum(len(logs) for logs in data["logs"].values())
+    print(f"{total} check-ins, {len(data['habits'])} habits, median of {args.runs} runs")
+    results = []
+    cases = [(name, JsonStorage, pretty) for name in codec.available() for pretty in (False, True)]
+    cases.append((codec.available()[0], BinaryStorage, False))
+    for name, storage_class, pretty in cases:
+        codec.use(name)
+        save_s, load_s, size = time_codec(data, storage_class, pretty, args.runs)
+        label = f"{name} {'binary' if storage_class is BinaryStorage else 'pretty' if pretty else 'compact'}"
+        result = {
+            "codec": name, "format": storage_class.snapshot_format, "pretty": pretty,
+            "save_s": save_s, "load_s": load_s, "bytes": size,
+        }
+        line = (f"{label:<16} save {save_s * 1000:7.0f} ms ({total / save_s / 1e6:5.2f} M/s)  "
+                f"load {load_s * 1000:7.0f} ms ({total / load_s / 1e6:6.2f} M/s)  {size / 1e6:5.1f} MB")
+        if storage_class is JsonStorage:
+            result["dumps_s"], result["loads_s"] = time_codec_only(snapshot, pretty, args.runs)
+            line += f"  | codec only: dumps {result['dumps_s'] * 1000:6.0f} ms  loads {result['loads_s'] * 1000:6.0f} ms"
+        results.append(result)
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"checkins": total, "runs": args.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checkins", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    main(parser.parse_args())
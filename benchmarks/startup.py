@@ -0,0 +1,84 @@
+"""
+Startup benchmark: wall time of `python main.py reminder` across data sizes.
+
+    python benchmarks/startup.py --sizes 0,1000,10000,100000 --runs 5
+
+For every size a throwaway root directory gets a JSON dataset with that
+many check-ins spread over 20 habits. The command is then run --runs times
+in a fresh interpreter; the median wall time and the --timings breakdown of
+the median run are reported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rich.console import Console  # noqa: E402
+from storage import JsonStorage, datetime_to_ts  # noqa: E402
+
+MAIN_PY = os.path.join(ROOT, "main.py")
+HABITS = 20
+
+
+def make_dataset(root, checkins):
+    """Write habits.json with the given number of check-ins, one per habit per day going back."""
+    with open(os.path.join(root, "config.json"), "w") as f:
+        json.dump({"rootPath": root}, f)
+    with open(os.path.join(root, "user.json"), "w") as f:
+        json.dump({"username": "bench"}, f)
+
+    today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    rows = (
+        (f"habit-{i % HABITS}", "daily", datetime_to_ts(today - timedelta(days=i // HABITS)))
+        for i in range(checkins)
+    )
+    storage = JsonStorage(os.path.join(root, "habits.json"), os.path.join(root, "habits.json.journal"), Console())
+    storage.load()
+    storage.import_checkins(rows)
+
+
+def run(root, command):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, MAIN_PY, "--timings"] + command, cwd=root,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    return time.perf_counter() - start, result.stderr.strip().splitlines()[-1]
+
+
+def main(args):
+    command = args.command.split()
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            make_dataset(root, size)
+            runs = sorted(run(root, command) for _ in range(args.runs))
+            _, timings = runs[len(runs) // 2]
+            results.append({
+                "checkins": size,
+                "median_ms": round(statistics.median(w for w, _ in runs) * 1000, 1),
+                "min_ms": round(runs[0][0] * 1000, 1),
+                "timings": timings,
+            })
+            print(f"{size:>9} check-ins: median {results[-1]['median_ms']:8.1f} ms   {timings}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"command": args.command, "runs": args.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="0,1000,10000,100000",
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--command", default="reminder", help="CLI command to time (default: reminder).")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    main(parser.parse_args())
@@ -0,0 +1,175 @@
+"""
+Benchmark suite for the HabitTracker operations, at several dataset sizes.
+
+    python benchmarks/suite.py --sizes 10,1000,100000,1000000 --json results.json
+    python benchmarks/suite.py --compare results.json      # flag regressions
+
+For every backend and size, a throwaway root directory gets a seeded
+dataset from the `fill` generator (20 habits, about size check-ins), then each
+operation is timed --repeat times in this process, each time on a freshly
+created tracker. Results (median and min seconds per operation) are printed
+and optionally written as JSON; with --compare, operations slower than the
+baseline by more than --tolerance are listed and the exit status is 1.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rich.console import Console  # noqa: E402
+from main import ConfigManager, HabitTracker  # noqa: E402
+from analytics import synthetic_checkins, synthetic_habits  # noqa: E402
+
+HABITS = 20
+DENSITY = 0.7
+# check_habit checks off a habit the generator creates.
+CHECKED_HABIT = synthetic_habits(HABITS)[0][0]
+
+
+def dataset(size, seed=0):
+    """Seeded streaky check-ins over HABITS habits, with roughly size rows in total."""
+    habits = synthetic_habits(HABITS)
+    weekly = sum(1 for _, period in habits if period == "weekly")
+    per_day = DENSITY * (len(habits) - weekly + weekly / 7)
+    return synthetic_checkins(habits, max(1, round(size / per_day)), DENSITY, seed)
+
+
+def make_tracker(root, backend, size):
+    cm = ConfigManager()
+    # Replace whatever config.json the working directory has: its format,
+    # backups or pretty_json settings must not skew the results.
+    cm.config_data = {"rootPath": root, "backend": backend, "data_file": "habits.json", "user_file": "user.json"}
+    with open(os.path.join(root, "user.json"), "w") as f:
+        json.dump({"username": "bench"}, f)
+    tracker = HabitTracker(cm)
+    quiet(tracker)
+    count, _ = tracker.storage.import_checkins(dataset(size))
+    tracker.save_data()
+    return cm, count
+
+
+def quiet(tracker):
+    console = Console(file=io.StringIO())
+    tracker.console = tracker.storage.console = console
+    return tracker
+
+
+def fresh(cm):
+    return quiet(HabitTracker(cm))
+
+
+def loaded(cm):
+    tracker = fresh(cm)
+    tracker.load_data()
+    return tracker
+
+
+# Operation name -> (setup, call). setup(cm) runs before every timed
+# call(state) with a new tracker, so nothing cached by a previous
+# repetition (e.g. the due queue) is reused.
+OPERATIONS = {
+    "load_data": (fresh, lambda t: t.load_data()),
+    # save_data() skips clean data, so time the full write it does when dirty.
+    "save_data": (loaded, lambda t: t.storage.save()),
+    "check_habit": (loaded, lambda t: t.check_habit(CHECKED_HABIT)),
+    "streaks": (loaded, lambda t: t.streaks()),
+    "summary": (loaded, lambda t: t.summary()),
+    "get_pending_habits": (loaded, lambda t: t.get_pending_habits()),
+    "dashboard_ascii": (loaded, lambda t: t.dashboard(ascii_mode=True)),
+}
+
+
+def time_op(cm, setup, call, repeat):
+    times = []
+    for _ in range(repeat):
+        state = setup(cm)
+        start = time.perf_counter()
+        call(state)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_suite(args):
+    results = []
+    for backend in args.backends:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory() as root:
+                started = time.perf_counter()
+                cm, count = make_tracker(root, backend, size)
+                print(f"{backend:>6} {size:>9}: {count} check-ins (generated in {time.perf_counter() - started:.2f}s)")
+                for name in args.ops:
+                    times = time_op(cm, *OPERATIONS[name], args.repeat)
+                    result = {
+                        "backend": backend, "size": size, "checkins": count, "op": name, "repeat": args.repeat,
+                        "median_s": statistics.median(times), "min_s": min(times),
+                    }
+                    results.append(result)
+                    print(f"    {name:<20} median {result['median_s'] * 1000:10.3f} ms   min {result['min_s'] * 1000:10.3f} ms")
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Print operations slower than the baseline by more than tolerance; True if there are none."""
+    with open(baseline_path) as f:
+        baseline = {(r["backend"], r["size"], r["op"]): r for r in json.load(f)["results"]}
+    ok = True
+    for r in results:
+        base = baseline.get((r["backend"], r["size"], r["op"]))
+        if not base:
+            continue
+        ratio = r["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        if ratio > 1 + tolerance:
+            ok = False
+            print(f"REGRESSION {r['backend']} {r['size']} {r['op']}: "
+                  f"{base['median_s'] * 1000:.3f} ms -> {r['median_s'] * 1000:.3f} ms ({ratio:.2f}x)")
+    return ok
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,100000", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--backends", default="json,sqlite,sharded", type=lambda s: s.split(","))
+    parser.add_argument("--ops", default=",".join(OPERATIONS), type=lambda s: s.split(","))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%).")
+    args = parser.parse_args()
+    unknown = set(args.ops) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+
+    results = run_suite(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import shutil
+from datetime import timedelta
+
+from analytics import EPOCH_DATE, SECONDS_PER_DAY, streak_runs
+from storage import atomic_write
+
+# Headless dashboard charts. Figures are built with matplotlib's object API
+# (no pyplot), so nothing needs a display: saving picks the Agg renderer for
+# PNG and the SVG renderer for SVG. Rendered images are cached on disk under
+# a key made of the chart type, format, date and storage.data_version(), so
+# asking again before the data changes only copies a file.
+
+CHART_TYPES = ("bars", "heatmap", "timeline")
+IMAGE_FORMATS = ("png", "svg")
+HEATMAP_WEEKS = 53
+
+
+def image_format(path):
+    fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image type '{path}'. Use a .png or .svg file.")
+    return fmt
+
+
+def draw_bars(fig, storage, today):
+    habits = list(storage.habits())
+    checkins = [storage.count_checkins(h) for h in habits]
+    ax = fig.add_subplot()
+    ax.barh(habits, checkins, color="blue")
+    ax.set_xlabel("Number of Check-ins")
+    ax.set_ylabel("Habits")
+    ax.set_title("Habit Progress Overview")
+
+
+def draw_heatmap(fig, storage, today):
+    """Check-ins of all habits per day over the last year, one column per week."""
+    days = {}
+    for name in storage.habits():
+        for day, count in storage.rollup(name)["day"].items():
+            days[day] = days.get(day, 0) + count
+
+    # Columns start on Mondays; the last column holds the current week.
+    first = today - timedelta(days=today.weekday() + 7 * (HEATMAP_WEEKS - 1))
+    grid = [[0] * HEATMAP_WEEKS for _ in range(7)]
+    for offset in range((today - first).days + 1):
+        d = first + timedelta(days=offset)
+        grid[d.weekday()][offset // 7] = days.get(d.isoformat(), 0)
+
+    ax = fig.add_subplot()
+    image = ax.imshow(grid, cmap="Greens", aspect="auto", interpolation="nearest")
+    ax.set_yticks(range(7), ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"])
+    months = [(w, first + timedelta(weeks=w)) for w in range(HEATMAP_WEEKS)]
+    ticks = [(w, d.strftime("%b")) for w, d in months if d.day <= 7]
+    ax.set_xticks([w for w, _ in ticks], [label for _, label in ticks])
+    ax.set_title(f"Check-ins per day since {first.isoformat()}")
+    fig.colorbar(image, ax=ax, label="Check-ins")
+
+
+def draw_timeline(fig, storage, today):
+    """One row per habit with a bar for every streak."""
+    habits = storage.habits()
+    ax = fig.add_subplot()
+    for row, (name, habit) in enumerate(habits.items()):
+        spans = [
+            (start // SECONDS_PER_DAY, (last - start) // SECONDS_PER_DAY + 1)
+            for start, last, _ in streak_runs(habit.get("periodicity"), storage.logs(name))
+        ]
+        ax.broken_barh(spans, (row - 0.4, 0.8), color="tab:green")
+    ax.set_yticks(range(len(habits)), list(habits))
+    ticks = ax.get_xticks()
+    ax.set_xticks(ticks, [(EPOCH_DATE + timedelta(days=int(t))).isoformat() for t in ticks], rotation=30)
+    ax.set_title("Streak Timeline")
+
+
+DRAWERS = {"bars": draw_bars, "heatmap": draw_heatmap, "timeline": draw_timeline}
+
+
+def render(storage, chart, path, today):
+    """Draw a chart of the current data and save it as PNG or SVG (from the extension)."""
+    from matplotlib.figure import Figure
+    fmt = image_format(path)
+    fig = Figure(figsize=(10, 5), layout="constrained")
+    DRAWERS[chart](fig, storage, today)
+    atomic_write(path, lambda f: fig.savefig(f, format=fmt), mode="wb")
+
+
+def show(storage, chart, today):
+    """Draw a chart in an interactive matplotlib window (needs a display)."""
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 5), layout="constrained")
+    DRAWERS[chart](fig, storage, today)
+    plt.show()
+
+
+def render_cached(storage, chart, output, cache_dir, today):
+    """
+    Write the chart to output, re-plotting only if the data changed since it
+    was last rendered. Returns True if the image came from the cache.
+    """
+    fmt = image_format(output)
+    key = hashlib.sha1(repr((chart, fmt, today.isoformat(), storage.data_version())).encode()).hexdigest()
+    cached = os.path.join(cache_dir, f"{chart}-{key[:16]}.{fmt}")
+
+    hit = os.path.exists(cached)
+    if not hit:
+        # Older renderings of this chart can never be served again.
+        if os.path.isdir(cache_dir):
+            for entry in os.listdir(cache_dir):
+                if entry.startswith(chart + "-") and entry.endswith("." + fmt):
+                    os.remove(os.path.join(cache_dir, entry))
+        render(storage, chart, cached, today)
+    shutil.copyfile(cached, output)
+    return hit
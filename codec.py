@@ -0,0 +1,114 @@
+import json
+import os
+
+# JSON encoding of the data, journal, config and user files. The fastest
+# installed library is used: orjson, then msgspec, then the standard json
+# module (HCLI_JSON_CODEC=json|orjson|msgspec forces one). Whatever the
+# library, dumps() returns compact UTF-8 bytes by default and 2-space
+# indented ones with pretty=True, and loads() accepts bytes, memoryviews or
+# str and raises ValueError on malformed input.
+
+CODECS = ("orjson", "msgspec", "json")
+CODEC_ENV = "HCLI_JSON_CODEC"
+
+name = None
+_dumps = None
+_loads = None
+
+
+def _orjson():
+    import orjson
+
+    def dumps(obj, pretty):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return dumps, orjson.loads
+
+
+def _msgspec():
+    import msgspec
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj, pretty):
+        data = encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+
+    def loads(data):
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return dumps, loads
+
+
+def _stdlib():
+    def dumps(obj, pretty):
+        if pretty:
+            return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+        # Without indent, json.dumps runs in C.
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+    def loads(data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+    return dumps, loads
+
+
+BACKENDS = {"orjson": _orjson, "msgspec": _msgspec, "json": _stdlib}
+
+
+def available():
+    """Names of the codecs that can be used here, fastest first."""
+    found = []
+    for candidate in CODECS:
+        try:
+            BACKENDS[candidate]()
+        except ImportError:
+            continue
+        found.append(candidate)
+    return found
+
+
+def use(codec=None):
+    """
+    Switch to the given codec, or to the one from HCLI_JSON_CODEC or the
+    fastest installed one. Returns its name.
+    """
+    global name, _dumps, _loads
+    codec = codec or os.environ.get(CODEC_ENV)
+    if codec and codec not in BACKENDS:
+        raise ValueError(f"Unknown JSON codec '{codec}'. Choose one of: {', '.join(CODECS)}")
+    for candidate in [codec] if codec else CODECS:
+        try:
+            _dumps, _loads = BACKENDS[candidate]()
+        except ImportError:
+            if codec:
+                raise
+            continue
+        name = candidate
+        return name
+
+
+def dumps(obj, pretty=False):
+    """Encode obj as JSON bytes, compact unless pretty."""
+    if _dumps is None:
+        use()
+    return _dumps(obj, pretty)
+
+
+def loads(data):
+    """Decode JSON from bytes, a memoryview or str."""
+    if _loads is None:
+        use()
+    return _loads(data)
+
+
+def dump(obj, f, pretty=False):
+    """Write obj as JSON to a file opened in binary mode."""
+    f.write(dumps(obj, pretty))
+
+
+def load(f):
+    """Read JSON from a file opened in binary mode."""
+    return loads(f.read())
@@ -0,0 +1,116 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import sys
+
+# Resident-tracker mode: `main.py serve` keeps a HabitTracker loaded and
+# answers commands on a Unix domain socket. This module only uses the
+# standard library so that the client side can forward a command before
+# main.py pays for importing typer/rich and loading the data.
+
+SOCKET_NAME = "hcli.sock"
+CONFIG_FILE = "config.json"
+
+# Commands that are answered by the daemon when it is running. Interactive
+# commands, config changes, the matplotlib dashboard, bulk import/export and
+# anything reading files or stdin (e.g. check-batch --file) or running until
+# interrupted (reminder --watch) always run locally.
+FORWARDED_COMMANDS = {
+    "add", "check", "check-batch", "delete", "details", "fill", "list_habits",
+    "reminder", "report", "reset", "streaks", "summary", "welcome",
+}
+
+
+def socket_path():
+    """The daemon socket lives in the configured root path (or the working directory)."""
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            root = json.load(f).get("rootPath", "")
+    except (OSError, ValueError):
+        root = ""
+    return os.path.join(root or os.getcwd(), SOCKET_NAME)
+
+
+def forward(argv):
+    """
+    Send a command to a running daemon. Returns (output, exit_code), or
+    None when the command must run locally or no daemon is listening.
+    """
+    if not hasattr(socket, "AF_UNIX") or not argv or argv[0] not in FORWARDED_COMMANDS:
+        return None
+    if "-" in argv or "--help" in argv or "--file" in argv or "--watch" in argv:
+        return None
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            with sock.makefile("rwb") as stream:
+                request = {"argv": argv}
+                stream.write(json.dumps(request).encode() + b"\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+    except (OSError, ValueError):
+        # Stale socket file or the daemon went away: run locally instead.
+        return None
+    return response["output"], response["exit_code"]
+
+
+def forward_and_exit(argv):
+    """Run argv on the daemon and exit with its status, if a daemon can take it."""
+    result = forward(argv)
+    if result is None:
+        return
+    output, exit_code = result
+    sys.stdout.write(output)
+    sys.stdout.flush()
+    sys.exit(exit_code)
+
+
+def serve(path, run_command, before_request=None):
+    """
+    Listen on path and answer one request per connection, one at a time.
+    run_command(argv) runs a CLI command in-process and returns its exit
+    code; everything it prints is captured and sent back to the client.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    # Shut down through the finally below (removing the socket) on SIGTERM too.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rwb") as stream:
+                try:
+                    request = json.loads(stream.readline())
+                except ValueError:
+                    continue
+
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                    try:
+                        if before_request:
+                            before_request()
+                        exit_code = run_command(request["argv"])
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        exit_code = 1
+
+                response = {"output": output.getvalue(), "exit_code": exit_code}
+                try:
+                    stream.write(json.dumps(response).encode() + b"\n")
+                    stream.flush()
+                except OSError:
+                    pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,260 @@
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import unquote, urlsplit
+
+import codec
+from storage import datetime_to_ts, ts_to_iso
+
+# HTTP/JSON API over a single resident HabitTracker (`main.py api`).
+#
+#   POST /habits                {"name": ..., "periodicity": "daily"|"weekly"}
+#   POST /habits/<name>/check   {"date": "YYYY-MM-DD"}  (body optional)
+#   GET  /habits/<name>         details of one habit
+#   GET  /streaks
+#   GET  /summary
+#   GET  /reminder
+#
+# Requests are handled one at a time on a single worker thread, so they all
+# see the same in-memory state, and waiting for the cross-process lock
+# (held by a CLI command, say) never stalls the event loop. Writes are
+# persisted write-behind: storage journals or commits them in batches, every
+# flush_interval seconds or as soon as max_pending writes have piled up, and
+# once more on shutdown.
+
+PERIODICITIES = ("daily", "weekly")
+MAX_BODY = 64 * 1024
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class HabitAPI:
+    def __init__(self, tracker, flush_interval=1.0, max_pending=100):
+        self.tracker = tracker
+        self.storage = tracker.storage
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending_writes = 0
+        # Runs every request and flush; storage is only touched from it.
+        self.worker = None
+
+    ####################################
+    # Endpoints
+    ####################################
+    def add(self, body):
+        name = body.get("name")
+        period = body.get("periodicity")
+        if not name or period not in PERIODICITIES:
+            raise HttpError(400, "Expected 'name' and a 'periodicity' of daily or weekly.")
+        with self.storage.transaction():
+            if name in self.storage.habits():
+                raise HttpError(409, f"Habit '{name}' already exists!")
+            self.write({
+                "op": "add",
+                "habit": name,
+                "periodicity": period,
+                "created_at": datetime.now().isoformat()
+            })
+        return 201, {"name": name, "periodicity": period}
+
+    def check(self, name, body):
+        date_str = body.get("date")
+        if date_str:
+            try:
+                at = datetime.strptime(date_str, "%Y-%m-%d").isoformat()
+            except ValueError:
+                raise HttpError(400, "Invalid date format. Use YYYY-MM-DD.")
+        else:
+            at = datetime.now().replace(microsecond=0).isoformat()
+        with self.storage.transaction():
+            if name not in self.storage.habits():
+                raise HttpError(404, f"Habit '{name}' not found!")
+            self.write({"op": "check", "habit": name, "at": at})
+        return 201, {"name": name, "at": at}
+
+    def details(self, name):
+        habits = self.storage.habits()
+        if name not in habits:
+            raise HttpError(404, f"Habit '{name}' not found!")
+        last_log = self.storage.last_checkin(name)
+        return 200, {
+            "name": name,
+            "periodicity": habits[name].get("periodicity"),
+            "created_at": habits[name].get("created_at"),
+            "last_checkin": ts_to_iso(last_log) if last_log is not None else None,
+            "total_checkins": self.storage.count_checkins(name)
+        }
+
+    def streaks(self):
+        records = self.storage.streak_records()
+        result = []
+        for name, habit in self.storage.habits().items():
+            record = records.get(name)
+            result.append({
+                "name": name,
+                "periodicity": habit.get("periodicity"),
+                "current": record["current"] if record else 0,
+                "longest": record["longest"] if record else 0
+            })
+        return 200, {"streaks": result}
+
+    def summary(self):
+        habits = self.storage.habits()
+        window_start = datetime_to_ts(datetime.now() - timedelta(days=30))
+        last_30_days = {name: self.storage.count_checkins(name, start=window_start) for name in habits}
+        fewest = min(last_30_days.values(), default=None)
+        return 200, {
+            "total_habits": len(habits),
+            "total_checkins": self.storage.total_checkins(),
+            "pending": self.pending_habits(),
+            "daily_habits": [h for h, d in habits.items() if d.get("periodicity") == "daily"],
+            "struggled_last_30_days": [
+                {"name": name, "checkins": count}
+                for name, count in last_30_days.items() if count == fewest
+            ]
+        }
+
+    def reminder(self):
+        return 200, {"pending": self.pending_habits()}
+
+    def pending_habits(self):
+        return [{"name": name, "periodicity": period} for name, period in self.tracker.get_pending_habits()]
+
+    def route(self, method, path, body):
+        parts = [unquote(p) for p in urlsplit(path).path.split("/") if p]
+        if method == "GET":
+            if parts == ["streaks"]:
+                return self.streaks()
+            if parts == ["summary"]:
+                return self.summary()
+            if parts == ["reminder"]:
+                return self.reminder()
+            if len(parts) == 2 and parts[0] == "habits":
+                return self.details(parts[1])
+        elif method == "POST":
+            if parts == ["habits"]:
+                return self.add(body)
+            if len(parts) == 3 and parts[0] == "habits" and parts[2] == "check":
+                return self.check(parts[1], body)
+        if method not in ("GET", "POST"):
+            raise HttpError(405, f"Method {method} not allowed.")
+        raise HttpError(404, f"No endpoint for {method} {path}.")
+
+    ####################################
+    # Write-behind persistence
+    ####################################
+    def write(self, record):
+        self.storage.apply(record)
+        self.pending_writes += 1
+        if self.pending_writes >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        if self.pending_writes:
+            self.storage.flush()
+            self.pending_writes = 0
+
+    async def in_worker(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.worker, func, *args)
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.in_worker(self.flush)
+            except Exception as e:
+                self.tracker.console.print(f"[red]Error saving data: {e}[/red]")
+
+    ####################################
+    # HTTP
+    ####################################
+    def respond(self, method, path, raw_body):
+        try:
+            body = codec.loads(raw_body) if raw_body.strip() else {}
+        except ValueError:
+            return 400, {"error": "Invalid JSON body."}
+        try:
+            if not isinstance(body, dict):
+                raise HttpError(400, "Expected a JSON object.")
+            return self.route(method, path, body)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive if asked to."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, payload = 400, {"error": "Request body too large."}
+                    raw_body = b""
+                else:
+                    raw_body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.in_worker(self.respond, method, path, raw_body)
+
+                keep_alive = (
+                    version.strip() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    and length <= MAX_BODY
+                )
+                data = codec.dumps(payload)
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8787, ready=None):
+        """Run the API until cancelled or sent SIGTERM. ready(server) is called once it listens."""
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, stopped.set)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows: Ctrl-C still stops the server
+
+        self.storage.write_behind = True
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        server = await asyncio.start_server(self.handle, host, port)
+        flusher = asyncio.ensure_future(self.flush_periodically())
+        try:
+            if ready:
+                ready(server)
+            await stopped.wait()
+        finally:
+            flusher.cancel()
+            server.close()
+            # Let a request still running finish first, then write what is left.
+            self.worker.shutdown(wait=True)
+            self.flush()
+            self.storage.write_behind = False
@@ -1,10 +1,33 @@
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+# When a `serve` daemon is running, hand the command to it before paying
+# for the typer/rich imports and the data load.
+if __name__ == "__main__":
+    import daemon
+    daemon.forward_and_exit(sys.argv[1:])
+
 import typer
-import json
+import codec
 from datetime import datetime, timedelta
 from rich.console import Console
-from rich.table import Table
+from typing import List
+from storage import (
+    BinaryStorage, JsonStorage, ShardedStorage, SqliteStorage, SNAPSHOT_FORMATS, STORAGE_BACKENDS,
+    datetime_to_ts, ts_to_iso,
+    exchange_format, read_checkins, write_checkins
+)
+from analytics import (
+    REPORT_GRANULARITIES, SAMPLE_HABITS, completion, recent_buckets, rollup_counts,
+    synthetic_checkins, synthetic_habits
+)
 import os
-import random
+
+# rich.table, csv and the backend-only modules (sqlite3, mmap, hashlib) are
+# imported by the commands and backends that use them.
+IMPORTED = time.perf_counter()
 
 ####################################
 # Helpers for graceful error handling
@@ -28,7 +51,11 @@ class ConfigManager:
         self.config_data = {
             "rootPath": "",
             "data_file": "habits.json",
-            "user_file": "user.json"
+            "user_file": "user.json",
+            "backend": "json",
+            "format": "json",
+            "backups": 0,
+            "pretty_json": False
         }
         self.load_config()
 
@@ -37,15 +64,15 @@ class ConfigManager:
         if not os.path.exists(self.CONFIG_FILE):
             root_path = os.getcwd()
             default_config = {"rootPath": root_path}
-            with open(self.CONFIG_FILE, "w") as f:
-                json.dump(default_config, f, indent=4)
+            with open(self.CONFIG_FILE, "wb") as f:
+                codec.dump(default_config, f)
             print(f"Config file created with root path: {root_path}")
 
     def load_config(self):
         try:
-            with open(self.CONFIG_FILE, "r") as f:
-                file_conf = json.load(f)
-            for k in ["rootPath", "data_file", "user_file"]:
+            with open(self.CONFIG_FILE, "rb") as f:
+                file_conf = codec.load(f)
+            for k in ["rootPath", "data_file", "user_file", "backend", "format", "backups", "pretty_json"]:
                 if k in file_conf:
                     self.config_data[k] = file_conf[k]
         except FileNotFoundError:
@@ -56,8 +83,8 @@ class ConfigManager:
 
     def save_config(self):
         try:
-            with open(self.CONFIG_FILE, "w") as f:
-                json.dump(self.config_data, f, indent=4)
+            with open(self.CONFIG_FILE, "wb") as f:
+                codec.dump(self.config_data, f, pretty=self.config_data["pretty_json"])
         except Exception as e:
             typer.echo(f"[red]Error saving config: {e}[/red]")
 
@@ -73,6 +100,28 @@ class ConfigManager:
         self.config_data["user_file"] = path
         self.save_config()
 
+    def set_backend(self, backend: str):
+        if backend not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Choose one of: {', '.join(STORAGE_BACKENDS)}")
+        self.config_data["backend"] = backend
+        self.save_config()
+
+    def set_format(self, fmt: str):
+        if fmt not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Choose one of: {', '.join(SNAPSHOT_FORMATS)}")
+        self.config_data["format"] = fmt
+        self.save_config()
+
+    def set_pretty_json(self, pretty: bool):
+        self.config_data["pretty_json"] = pretty
+        self.save_config()
+
+    def set_backups(self, count: int):
+        if count < 0:
+            raise ValueError("The number of backups can't be negative.")
+        self.config_data["backups"] = count
+        self.save_config()
+
     def show(self):
         typer.echo("Current Configuration:")
         for k, v in self.config_data.items():
@@ -82,6 +131,9 @@ class ConfigManager:
 # Main HabitTracker class
 ####################################
 class HabitTracker:
+    # Longest sleep of `reminder --watch` between looks at the data.
+    WATCH_MAX_SLEEP = 3600
+
     def __init__(self, config: ConfigManager):
         self.console = Console()
         self.config = config
@@ -100,42 +152,95 @@ class HabitTracker:
 
         self.DATA_FILE = dataFile
         self.USER_FILE = userFile
-
-        self.data = self.load_data()
-        self.username = self.load_user()
+        # Append-only journal of small records (add/check/uncheck) written
+        # between full snapshots of DATA_FILE.
+        self.JOURNAL_FILE = dataFile + ".journal"
+        # Snapshot of the json backend in the binary format (`config --format binary`).
+        self.BINARY_FILE = os.path.splitext(dataFile)[0] + ".bin"
+        self.DB_FILE = os.path.splitext(dataFile)[0] + ".db"
+        # Manifest plus one log file per habit, for the sharded backend.
+        self.SHARD_DIR = os.path.splitext(dataFile)[0] + ".shards"
+        # Rendered dashboard images, keyed by the data version.
+        self.CHART_CACHE_DIR = dataFile + ".charts"
+
+        backend = self.config.config_data.get("backend", "json")
+        if backend == "sqlite":
+            # A new database is seeded from the existing JSON data, if any.
+            self.storage = SqliteStorage(self.DB_FILE, self.console, seed_file=self.DATA_FILE)
+        elif backend == "sharded":
+            self.storage = ShardedStorage(self.SHARD_DIR, self.console, seed_file=self.DATA_FILE)
+        else:
+            self.storage = self.snapshot_storage(self.config.config_data.get("format", "json"))
+
+        # Habit data and the username are only read from disk on first
+        # access, so commands like intro/config/--help never parse them.
+        self._username = None
+        # Number of changes made through this tracker; no-ops (unchecking a
+        # day without check-ins, resetting an empty tracker) don't count.
+        self.changes = 0
+
+    def snapshot_storage(self, fmt, seeded=True):
+        """
+        The json backend storage whose snapshot is in the given format. Unless
+        seeded is False, it starts out from the data in the other format.
+        """
+        backups = self.config.config_data.get("backups", 0)
+        other = "json" if fmt == "binary" else "binary"
+        seed = self.snapshot_storage(other, seeded=False) if seeded else None
+        if fmt == "binary":
+            return BinaryStorage(self.BINARY_FILE, self.BINARY_FILE + ".journal", self.console, backups, seed)
+        storage = JsonStorage(self.DATA_FILE, self.JOURNAL_FILE, self.console, backups, seed)
+        storage.pretty = self.config.config_data.get("pretty_json", False)
+        return storage
+
+    @property
+    def data(self):
+        return self.storage.data
+
+    @property
+    def username(self):
+        if self._username is None:
+            self._username = self.load_user() or ""
+        return self._username
 
     def load_data(self):
-        try:
-            with open(self.DATA_FILE, "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {"habits": {}, "logs": {}}
-        except Exception as e:
-            self.console.print(f"[red]Error loading data: {e}[/red]")
-            return {"habits": {}, "logs": {}}
+        return self.storage.load()
 
-    def save_data(self):
-        try:
-            d = os.path.dirname(self.DATA_FILE)
-            if d and not os.path.exists(d):
-                os.makedirs(d)
+    def refresh(self):
+        """
+        Pick up changes made by other processes (used by the resident `serve`
+        mode). The user file is re-read but never prompted for: the daemon's
+        stdin is not the forwarding client's.
+        """
+        self._username = self.load_user(prompt=False) or ""
+        self.storage.refresh()
 
-            with open(self.DATA_FILE, "w") as f:
-                json.dump(self.data, f, indent=4)
-        except Exception as e:
-            self.console.print(f"[red]Error saving data: {e}[/red]")
+    def save_data(self):
+        """
+        Write the data if any habit changed since it was last written; the
+        sharded backend rewrites only the changed habits. Returns True if it did.
+        """
+        if not self.storage.dirty:
+            return False
+        self.storage.save()
+        return True
 
-    def load_user(self):
+    def load_user(self, prompt: bool = True):
+        """The username from USER_FILE; if there is none, ask for one unless prompt is False."""
         try:
-            with open(self.USER_FILE, "r") as f:
-                user_data = json.load(f)
+            with open(self.USER_FILE, "rb") as f:
+                user_data = codec.load(f)
                 return user_data.get("username", "")
         except FileNotFoundError:
-            return self.setup_user()
+            return self.setup_user() if prompt else ""
         except Exception as e:
             self.console.print(f"[red]Error loading user info: {e}[/red]")
             return ""
 
+    def save_user(self, username: str):
+        with open(self.USER_FILE, "wb") as f:
+            codec.dump({"username": username}, f, pretty=self.config.config_data.get("pretty_json", False))
+
     def setup_user(self):
         try:
             # Ensure config exists before proceeding
@@ -151,8 +256,7 @@ class HabitTracker:
             if ud and not os.path.exists(ud):
                 os.makedirs(ud)
 
-            with open(self.USER_FILE, "w") as f:
-                json.dump({"username": username}, f, indent=4)
+            self.save_user(username)
 
             self.console.print(f"[green]Username '{username}' has been set successfully![/green]")
             
@@ -176,6 +280,7 @@ This program helps you create, track, and analyze habits. You can:
 - [green]intro[/green]: This introduction.
 - [green]add[/green]: Create a new habit.
 - [green]check[/green]: Mark a habit as complete.
+- [green]check-batch[/green]: Check off many habits/dates at once.
 - [green]list_habits[/green]: Show all tracked habits.
 - [green]streaks[/green]: See your best streaks.
 - [green]reminder[/green]: Show overdue habits.
@@ -183,9 +288,13 @@ This program helps you create, track, and analyze habits. You can:
 - [green]dashboard[/green]: Show a chart (ASCII or Matplotlib).
 - [green]delete[/green]: Remove a habit (or remove a single check).
 - [green]details[/green]: Detailed info on a habit.
+- [green]report[/green]: Check-ins and completion per day/week/month/year.
+- [green]export[/green] / [green]import[/green]: Move check-in history in/out as CSV or NDJSON.
 - [green]fill[/green]: Generate some fake data.
 - [green]reset[/green]: Wipe everything.
-- [green]config[/green]: Adjust file paths or root path.
+- [green]config[/green]: Adjust file paths, root path or storage backend.
+- [green]serve[/green]: Keep the tracker resident so other commands answer in milliseconds.
+- [green]api[/green]: Serve habits as a JSON HTTP API for dashboards and other clients.
 - [green]welcome[/green]: Display a welcome message & summary.
 
 [b]Usage Examples:[/b]
@@ -194,6 +303,7 @@ This program helps you create, track, and analyze habits. You can:
 - python main.py streaks
 - python main.py config --show
 - python main.py config --data-file MyHabits.json
+- python main.py config --backend sqlite
 
 Enjoy tracking your habits!
 """)
@@ -209,14 +319,16 @@ Enjoy tracking your habits!
                 self.console.print("- `intro`: Brief introduction about this program")
                 self.console.print("- `add <habit> <daily/weekly>`: Add a new habit")
                 self.console.print("- `check <habit>`: Mark a habit as completed")
+                self.console.print("- `check-batch <habits...> --from/--to/--file`: Check off many habits/dates at once")
                 self.console.print("- `list_habits`: Show all habits")
                 self.console.print("- `streaks`: View your habit streaks")
                 self.console.print("- `summary`: View analytics and performance")
-                self.console.print("- `reminder`: Get reminders for pending habits")
+                self.console.print("- `reminder [--watch]`: Get reminders for pending habits")
                 self.console.print("- `dashboard`: Show a graphical or CLI analysis of habits")
                 self.console.print("- `delete <habit>`: Remove a habit (or a single check).")
                 self.console.print("- `details <habit>`: Show detailed info about a habit")
-                self.console.print("- `fill`: Populate fake data for testing.")
+                self.console.print("- `report --by month`: Check-ins and completion per day/week/month/year")
+                self.console.print("- `fill [--habits N --days D --density P --seed S]`: Populate fake data for testing.")
                 self.console.print("- `reset`: Reset all habits and logs.")
                 self.console.print("- `config`: Manage configuration.")
                 self.console.print("\nFor more info, run: [blue]python main.py --help[/blue]")
@@ -240,19 +352,22 @@ Enjoy tracking your habits!
 
     def add_habit(self, name: str, periodicity: str):
         try:
-            if not name or not periodicity:
-                self.console.print("[red]Error: Missing 'name' or 'periodicity'.[/red]")
-                return
-            if name in self.data["habits"]:
-                self.console.print(f"[red]Habit '{name}' already exists![/red]")
-                return
+            with self.storage.transaction():
+                if not name or not periodicity:
+                    self.console.print("[red]Error: Missing 'name' or 'periodicity'.[/red]")
+                    return
+                if name in self.storage.habits():
+                    self.console.print(f"[red]Habit '{name}' already exists![/red]")
+                    return
 
-            self.data["habits"][name] = {
-                "periodicity": periodicity,
-                "created_at": datetime.now().isoformat()
-            }
-            self.save_data()
-            self.console.print(f"[green]Habit '{name}' ({periodicity}) added successfully![/green]")
+                self.storage.apply({
+                    "op": "add",
+                    "habit": name,
+                    "periodicity": periodicity,
+                    "created_at": datetime.now().isoformat()
+                })
+                self.changes += 1
+                self.console.print(f"[green]Habit '{name}' ({periodicity}) added successfully![/green]")
         except Exception as e:
             self.console.print(f"[red]Error adding habit: {e}[/red]")
 
@@ -262,40 +377,113 @@ Enjoy tracking your habits!
         Default is today's date if no date_str is provided.
         """
         try:
-            if name not in self.data["habits"]:
-                self.console.print(f"[red]Habit '{name}' not found![/red]")
-                return
-
-            if date_str:
-                # parse the user-provided date
-                try:
-                    custom_date = datetime.strptime(date_str, "%Y-%m-%d")
-                    log_str = custom_date.isoformat()
-                except ValueError:
-                    self.console.print("[red]Invalid date format. Use YYYY-MM-DD.[/red]")
+            with self.storage.transaction():
+                habits = self.storage.habits()
+                if name not in habits:
+                    self.console.print(f"[red]Habit '{name}' not found![/red]")
                     return
-            else:
-                # default to today's date/time
-                log_str = datetime.now().isoformat()
 
-            if name not in self.data["logs"]:
-                self.data["logs"][name] = []
-            self.data["logs"][name].append(log_str)
+                if date_str:
+                    # parse the user-provided date
+                    try:
+                        custom_date = datetime.strptime(date_str, "%Y-%m-%d")
+                        log_str = custom_date.isoformat()
+                    except ValueError:
+                        self.console.print("[red]Invalid date format. Use YYYY-MM-DD.[/red]")
+                        return
+                else:
+                    # default to today's date/time (check-ins are stored to the second)
+                    log_str = datetime.now().replace(microsecond=0).isoformat()
+
+                self.storage.apply({"op": "check", "habit": name, "at": log_str})
+                self.changes += 1
 
-            self.save_data()
-            period = self.data["habits"][name].get("periodicity", "daily/weekly?")
-            self.console.print(f"[green]Checked off '{name}' ({period}) on {log_str}[/green]")
+                period = habits[name].get("periodicity", "daily/weekly?")
+                self.console.print(f"[green]Checked off '{name}' ({period}) on {log_str}[/green]")
         except Exception as e:
             self.console.print(f"[red]Error checking habit: {e}[/red]")
 
+    def check_batch(self, names: List[str] = None, date_from: str = None, date_to: str = None, file_path: str = None):
+        """
+        Check off many habits/dates with a single load and a single save.
+        Every habit in names is checked for each day from date_from to date_to
+        (inclusive; date_to defaults to today, no range means today). file_path
+        ('-' for stdin) adds one 'habit,date' line per check, date optional.
+        """
+        try:
+            if date_to and not date_from:
+                self.console.print("[red]--to needs --from to start the range.[/red]")
+                return
+            if date_from and not names:
+                self.console.print("[red]--from/--to apply to the habits named on the command line; the file has its own dates.[/red]")
+                return
+            with self.storage.transaction():
+                habits = self.storage.habits()
+                today = datetime.now().replace(microsecond=0)
+                pairs = []
+
+                if names:
+                    if date_from:
+                        try:
+                            start = datetime.strptime(date_from, "%Y-%m-%d")
+                            end = datetime.strptime(date_to, "%Y-%m-%d") if date_to else today.replace(hour=0, minute=0, second=0)
+                        except ValueError:
+                            self.console.print("[red]Invalid date format. Use YYYY-MM-DD.[/red]")
+                            return
+                        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+                        log_strs = [day.isoformat() for day in days]
+                    else:
+                        log_strs = [today.isoformat()]
+                    pairs.extend((name, log_str) for name in names for log_str in log_strs)
+
+                if file_path:
+                    import csv
+                    f = sys.stdin if file_path == "-" else open(file_path, "r", newline="")
+                    try:
+                        for lineno, row in enumerate(csv.reader(f), start=1):
+                            if not row or not row[0].strip():
+                                continue
+                            date_str = row[1].strip() if len(row) > 1 else ""
+                            try:
+                                log_str = datetime.strptime(date_str, "%Y-%m-%d").isoformat() if date_str else today.isoformat()
+                            except ValueError:
+                                self.console.print(f"[yellow]Line {lineno}: invalid date '{date_str}', skipped.[/yellow]")
+                                continue
+                            pairs.append((row[0].strip(), log_str))
+                    finally:
+                        if f is not sys.stdin:
+                            f.close()
+
+                records = []
+                unknown = set()
+                for name, log_str in pairs:
+                    if name not in habits:
+                        unknown.add(name)
+                        continue
+                    records.append({"op": "check", "habit": name, "at": log_str})
+
+                for name in sorted(unknown):
+                    self.console.print(f"[red]Habit '{name}' not found![/red]")
+                if not records:
+                    self.console.print("[yellow]Nothing to check off.[/yellow]")
+                    return
+
+                self.storage.apply_many(records)
+                self.changes += len(records)
+                checked_habits = len({r["habit"] for r in records})
+                self.console.print(f"[green]Checked off {len(records)} check-ins across {checked_habits} habits.[/green]")
+        except Exception as e:
+            self.console.print(f"[red]Error checking habits in batch: {e}[/red]")
+
     def list_habits_cmd(self):
+        from rich.table import Table
         try:
             table = Table(title="Tracked Habits")
             table.add_column("Name", style="cyan")
             table.add_column("Periodicity", style="magenta")
             table.add_column("Created At", style="green")
 
-            for name, habit in self.data["habits"].items():
+            for name, habit in self.storage.habits().items():
                 table.add_row(name, habit["periodicity"], habit["created_at"])
 
             self.console.print(table)
@@ -304,41 +492,33 @@ Enjoy tracking your habits!
 
     def streaks(self):
         """Show the longest streak overall and display streaks for each habit."""
+        from rich.table import Table
         try:
             table = Table(title="Habit Streaks")
             table.add_column("Habit", style="cyan")
             table.add_column("Periodicity", style="magenta")
             table.add_column("Streak (days/weeks)", style="magenta")
+            table.add_column("Longest ever", style="green")
 
             longest_streak = 0
             best_habit = None
 
-            for name, logs in self.data.get("logs", {}).items():
-                if name not in self.data["habits"]:
+            # Streak records are maintained on every check/delete, so this
+            # only reads one cached record per habit.
+            records = self.storage.streak_records()
+            for name, habit in self.storage.habits().items():
+                period = habit.get("periodicity", "?")
+                record = records.get(name)
+                if not record:
+                    table.add_row(name, period, "0", "0")
                     continue
-                period = self.data["habits"][name].get("periodicity", "?")
-                sorted_logs = sorted([datetime.fromisoformat(log) for log in logs], reverse=True)
-                if not sorted_logs:
-                    table.add_row(name, period, "0")
-                    continue
-
-                streak = 1
-                prev_date = sorted_logs[0]
-                for log in sorted_logs[1:]:
-                    diff = (prev_date - log).days
-                    if period == "daily" and diff == 1:
-                        streak += 1
-                    elif period == "weekly" and diff <= 7:
-                        streak += 1
-                    else:
-                        break
-                    prev_date = log
 
+                streak = record["current"]
                 if streak > longest_streak:
                     longest_streak = streak
                     best_habit = name
 
-                table.add_row(name, period, str(streak))
+                table.add_row(name, period, str(streak), str(record["longest"]))
 
             self.console.print(table)
 
@@ -354,53 +534,43 @@ Enjoy tracking your habits!
         Remove an entire habit if no date is specified, or remove a single check from logs for that date.
         """
         try:
-            if name not in self.data["habits"]:
-                self.console.print(f"[red]Habit '{name}' not found![/red]")
-                return
-
-            if date_str:
-                # remove a single check for the specified date
-                if name not in self.data["logs"]:
-                    self.console.print("[yellow]No logs for this habit to remove.[/yellow]")
+            with self.storage.transaction():
+                if name not in self.storage.habits():
+                    self.console.print(f"[red]Habit '{name}' not found![/red]")
                     return
-                try:
-                    # parse user date
-                    custom_date = datetime.strptime(date_str, "%Y-%m-%d")
-                    iso_str = custom_date.isoformat()
-
-                    # remove any matching date from logs
-                    old_count = len(self.data["logs"][name])
-                    self.data["logs"][name] = [
-                        dt for dt in self.data["logs"][name]
-                        if not dt.startswith(iso_str)
-                    ]
-                    new_count = len(self.data["logs"][name])
-                    removed = old_count - new_count
-
-                    self.console.print(f"[green]Removed {removed} checks dated {date_str} from '{name}'.[/green]")
-                    self.save_data()
-                except ValueError:
-                    self.console.print("[red]Invalid date format. Use YYYY-MM-DD.[/red]")
-            else:
-                # remove the entire habit
-                del self.data["habits"][name]
-                if name in self.data["logs"]:
-                    del self.data["logs"][name]
-                self.save_data()
-                self.console.print(f"[red]Habit '{name}' deleted entirely.[/red]")
+
+                if date_str:
+                    # remove a single check for the specified date
+                    if not self.storage.count_checkins(name):
+                        self.console.print("[yellow]No logs for this habit to remove.[/yellow]")
+                        return
+                    try:
+                        # parse user date
+                        custom_date = datetime.strptime(date_str, "%Y-%m-%d")
+                        iso_str = custom_date.isoformat()
+
+                        # remove any matching date from logs
+                        removed = self.storage.apply({"op": "uncheck", "habit": name, "date": iso_str})
+                        if not removed:
+                            self.console.print(f"[yellow]No checks dated {date_str} in '{name}', nothing removed.[/yellow]")
+                            return
+
+                        self.changes += 1
+                        self.console.print(f"[green]Removed {removed} checks dated {date_str} from '{name}'.[/green]")
+                    except ValueError:
+                        self.console.print("[red]Invalid date format. Use YYYY-MM-DD.[/red]")
+                else:
+                    # remove the entire habit
+                    self.storage.apply({"op": "delete", "habit": name})
+                    self.changes += 1
+                    self.console.print(f"[red]Habit '{name}' deleted entirely.[/red]")
         except Exception as e:
             self.console.print(f"[red]Error deleting habit: {e}[/red]")
 
     def calc_30days_checkins(self, name):
         """Calculate how many check-ins in the last 30 days for the specified habit."""
-        logs = self.data.get("logs", {}).get(name, [])
         thirty_days_ago = datetime.now() - timedelta(days=30)
-        count_30 = 0
-        for log in logs:
-            dt = datetime.fromisoformat(log)
-            if dt >= thirty_days_ago:
-                count_30 += 1
-        return count_30
+        return self.storage.count_checkins(name, start=datetime_to_ts(thirty_days_ago))
 
     def summary(self):
         """
@@ -412,8 +582,9 @@ Enjoy tracking your habits!
           - habits user struggled with last month
         """
         try:
-            total_habits = len(self.data.get("habits", {}))
-            total_checkins = sum(len(logs) for logs in self.data.get("logs", {}).values())
+            habits = self.storage.habits()
+            total_habits = len(habits)
+            total_checkins = self.storage.total_checkins()
 
             self.console.print(f"[yellow]Total habits:[/yellow] {total_habits}")
             self.console.print(f"[green]Total check-ins:[/green] {total_checkins}")
@@ -428,7 +599,7 @@ Enjoy tracking your habits!
             else:
                 self.console.print("\n[green]No pending habits for today/week![/green]")
 
-            daily_list = [h for h, d in self.data.get("habits", {}).items() if d.get("periodicity") == "daily"]
+            daily_list = [h for h, d in habits.items() if d.get("periodicity") == "daily"]
             if daily_list:
                 self.console.print("\n[blue]Current Daily Habits:[/blue]")
                 for hname in daily_list:
@@ -437,9 +608,11 @@ Enjoy tracking your habits!
                 self.console.print("\n[yellow]No daily habits found.[/yellow]")
 
             if total_habits > 0:
+                # One window for all habits; each count is two bisections of the sorted logs.
+                window_start = datetime_to_ts(datetime.now() - timedelta(days=30))
                 struggle_list = []
-                for habit, details in self.data.get("habits", {}).items():
-                    checks_30 = self.calc_30days_checkins(habit)
+                for habit in habits:
+                    checks_30 = self.storage.count_checkins(habit, start=window_start)
                     struggle_list.append((habit, checks_30))
 
                 struggle_list.sort(key=lambda x: x[1])
@@ -455,33 +628,18 @@ Enjoy tracking your habits!
             self.console.print(f"[red]Error generating summary: {e}[/red]")
 
     def get_pending_habits(self):
+        """(habit, periodicity) of the habits due now, most overdue first."""
         pending_list = []
         try:
-            today = datetime.now().date()
-            for habit, details in self.data.get("habits", {}).items():
-                period = details.get("periodicity", "daily")
-
-                if habit not in self.data.get("logs", {}):
-                    pending_list.append((habit, period))
-                    continue
-
-                logs = self.data["logs"][habit]
-                if not logs:
-                    pending_list.append((habit, period))
-                    continue
-
-                last_logged = datetime.fromisoformat(logs[-1]).date()
-
-                if period == "daily" and last_logged < today:
-                    pending_list.append((habit, period))
-                elif period == "weekly":
-                    if (today - last_logged).days > 7:
-                        pending_list.append((habit, period))
+            # Habits are kept in a min-heap by next due time, so only the
+            # pending ones are looked at.
+            now = datetime_to_ts(datetime.now())
+            pending_list = self.storage.due_queue().pending(now)
         except Exception as e:
             self.console.print(f"[red]Error getting pending habits: {e}[/red]")
         return pending_list
 
-    def reminder(self):
+    def reminder(self, watch: bool = False):
         try:
             pending_list = self.get_pending_habits()
             if pending_list:
@@ -490,22 +648,54 @@ Enjoy tracking your habits!
                     self.console.print(f"- {habit_name} ({period})")
             else:
                 self.console.print("[green]All habits are up to date![/green]")
+            if watch:
+                queue = self.storage.due_queue()
+                self.watch_reminders({name: queue.entries[name][0] for name, _ in pending_list})
+        except KeyboardInterrupt:
+            self.console.print("[yellow]Stopped watching.[/yellow]")
         except Exception as e:
             self.console.print(f"[red]Error generating reminders: {e}[/red]")
 
-    def dashboard(self, ascii_mode: bool = False):
+    def watch_reminders(self, notified):
+        """
+        Sleep until the next habit falls due and announce it. notified maps
+        habits to the due time already announced. Check-ins made meanwhile
+        by other processes are picked up on every wake-up; sleeps are capped
+        at WATCH_MAX_SLEEP so that new habits are noticed eventually.
+        """
+        self.console.print("\n[cyan]Watching for due habits (Ctrl-C to stop)...[/cyan]")
+        while True:
+            self.refresh()
+            queue = self.storage.due_queue()
+            now = datetime_to_ts(datetime.now())
+            for name, period in queue.pending(now):
+                due = queue.entries[name][0]
+                if notified.get(name) == due:
+                    continue
+                notified[name] = due
+                self.console.print(
+                    f"[red]{datetime.now():%Y-%m-%d %H:%M}[/red] '{name}' ({period}) is due."
+                )
+            next_due = queue.next_due(after=now)
+            delay = self.WATCH_MAX_SLEEP if next_due is None else min(self.WATCH_MAX_SLEEP, next_due - now)
+            time.sleep(max(delay, 1))
+
+    def dashboard(self, ascii_mode: bool = False, output: str = None, chart: str = "bars"):
+        """
+        Chart the habits: as ASCII bars, in a matplotlib window, or rendered
+        headlessly to a PNG/SVG file (bars, calendar heatmap or streak timeline).
+        """
         try:
-            if not self.data.get("logs"):
-                self.console.print("[yellow]No habit logs to display on dashboard.[/yellow]")
+            if output:
+                self.render_dashboard(output, chart)
                 return
-
-            habits = list(self.data["logs"].keys())
-            checkins = [len(logs) for logs in self.data["logs"].values()]
-
+            habits = list(self.storage.habits())
             if not habits:
-                self.console.print("[yellow]No habits to show in dashboard.[/yellow]")
+                self.console.print("[yellow]No habit logs to display on dashboard.[/yellow]")
                 return
 
+            checkins = [self.storage.count_checkins(h) for h in habits]
+
             if ascii_mode:
                 max_checkins = max(checkins)
                 if max_checkins == 0:
@@ -518,83 +708,184 @@ Enjoy tracking your habits!
                     bar = "#" * bar_len
                     self.console.print(f"[blue]{h}[/blue] ({c} check-ins): [green]{bar}[/green]")
             else:
-                import matplotlib.pyplot as plt
-                plt.figure(figsize=(10, 5))
-                plt.barh(habits, checkins, color='blue')
-                plt.xlabel("Number of Check-ins")
-                plt.ylabel("Habits")
-                plt.title("Habit Progress Overview")
-                plt.show()
+                import charts
+                if chart not in charts.CHART_TYPES:
+                    self.console.print(f"[red]Unknown chart '{chart}'. Choose one of: {', '.join(charts.CHART_TYPES)}[/red]")
+                    return
+                charts.show(self.storage, chart, datetime.now().date())
         except Exception as e:
             self.console.print(f"[red]Error displaying dashboard: {e}[/red]")
 
+    def render_dashboard(self, output: str, chart: str = "bars"):
+        import charts
+        if chart not in charts.CHART_TYPES:
+            self.console.print(f"[red]Unknown chart '{chart}'. Choose one of: {', '.join(charts.CHART_TYPES)}[/red]")
+            return
+        # On a cache hit the habit data is never loaded.
+        cached = charts.render_cached(self.storage, chart, output, self.CHART_CACHE_DIR, datetime.now().date())
+        self.console.print(f"[green]Saved {chart} chart to {output}{' (cached)' if cached else ''}.[/green]")
+
     def details(self, name: str):
         try:
-            if name not in self.data.get("habits", {}):
+            habits = self.storage.habits()
+            if name not in habits:
                 self.console.print(f"[red]Habit '{name}' not found![/red]")
                 return
 
-            habit_info = self.data["habits"][name]
+            habit_info = habits[name]
             period = habit_info.get("periodicity", "daily/weekly?")
 
-            logs = self.data.get("logs", {}).get(name, [])
-            last_checked = logs[-1] if logs else "Never"
+            last_log = self.storage.last_checkin(name)
+            last_checked = ts_to_iso(last_log) if last_log is not None else "Never"
 
             self.console.print(f"[cyan]Habit:[/cyan] {name} ({period})")
             self.console.print(f"[yellow]Periodicity:[/yellow] {period}")
             self.console.print(f"[green]Last checked-in:[/green] {last_checked}")
 
-            total_ci = len(logs)
+            total_ci = self.storage.count_checkins(name)
             self.console.print(f"[blue]Total check-ins so far:[/blue] {total_ci}")
         except Exception as e:
             self.console.print(f"[red]Error displaying details for habit '{name}': {e}[/red]")
 
-    def fill_data(self):
+    def report(self, granularity: str = "month", last: int = 6, name: str = None):
         """
-        Generate fake data covering at least two months.
+        Show check-ins and completion per day/week/month/year for the most
+        recent buckets. Reads the rollups kept on every write, not the logs.
         """
+        from rich.table import Table
         try:
-            sample_habits = [
-                ("Workout", "daily"),
-                ("ReadBook", "daily"),
-                ("WaterPlants", "daily"),
-                ("GuitarPractice", "daily"),
-                ("WeeklyGrocery", "weekly"),
-                ("PayBills", "weekly")
-            ]
-
-            # Add sample habits if not present
-            for (habit_name, period) in sample_habits:
-                if habit_name not in self.data["habits"]:
-                    self.data["habits"][habit_name] = {
-                        "periodicity": period,
-                        "created_at": datetime.now().isoformat()
-                    }
-                if habit_name not in self.data["logs"]:
-                    self.data["logs"][habit_name] = []
-
-            # Generate random check-ins for the past 2 months (60 days)
-            for habit_name, details in self.data["habits"].items():
-                # random number of check-ins (between 10 and 30 for variety)
-                random_days = random.randint(10, 30)
-                base_date = datetime.now()
-
-                for _ in range(random_days):
-                    day_offset = random.randint(1, 60)  # up to 60 days in the past
-                    log_date = base_date - timedelta(days=day_offset)
-                    log_str = log_date.isoformat()
-                    self.data["logs"][habit_name].append(log_str)
-
-            self.save_data()
-            self.console.print("[green]Fake data added successfully (covering ~2 months)! Now you can test functionalities.[/green]")
+            if granularity not in REPORT_GRANULARITIES:
+                self.console.print(
+                    f"[red]Unknown period '{granularity}'. Choose one of: {', '.join(REPORT_GRANULARITIES)}[/red]"
+                )
+                return
+            habits = self.storage.habits()
+            if name:
+                if name not in habits:
+                    self.console.print(f"[red]Habit '{name}' not found![/red]")
+                    return
+                habits = {name: habits[name]}
+            if not habits:
+                self.console.print("[yellow]No habits to report on.[/yellow]")
+                return
+
+            buckets = recent_buckets(granularity, datetime.now().date(), last)
+            table = Table(title=f"Check-ins per {granularity} (completion)")
+            table.add_column("Habit", style="cyan")
+            table.add_column("Periodicity", style="magenta")
+            for key, _ in buckets:
+                table.add_column(key, justify="right")
+
+            for habit, info in habits.items():
+                period = info.get("periodicity", "daily")
+                counts = rollup_counts(self.storage.rollup(habit), granularity)
+                cells = []
+                for key, days in buckets:
+                    count = counts.get(key, 0)
+                    cells.append(f"{count} ({completion(period, count, days):.0f}%)")
+                table.add_row(habit, period, *cells)
+
+            self.console.print(table)
+        except Exception as e:
+            self.console.print(f"[red]Error generating report: {e}[/red]")
+
+    def fill_data(self, habits: int = None, days: int = 60, density: float = 0.4, seed: int = None):
+        """
+        Generate a streaky check-in history for the sample habits (or for
+        `habits` generated ones) over the last `days` days, streamed into the
+        storage in bulk. The same seed reproduces the same history.
+        """
+        try:
+            with self.storage.transaction():
+                names = synthetic_habits(habits if habits is not None else len(SAMPLE_HABITS))
+                rows = synthetic_checkins(names, days, density, seed)
+                count, new_habits = self.storage.import_checkins(rows)
+                self.changes += count
+                self.console.print(
+                    f"[green]Fake data added successfully: {count} check-ins over {days} days "
+                    f"for {len(names)} habits ({new_habits} new). Now you can test functionalities.[/green]"
+                )
         except Exception as e:
             self.console.print(f"[red]Error filling data: {e}[/red]")
 
+    def export_checkins(self, output: str = "-", fmt: str = None):
+        """Stream every check-in to a CSV/NDJSON file ('-' for stdout)."""
+        try:
+            fmt = exchange_format(output, fmt)
+            rows = self.storage.iter_checkins()
+            if output == "-":
+                write_checkins(sys.stdout, rows, fmt)
+                return
+            with open(output, "w", newline="") as f:
+                count = write_checkins(f, rows, fmt)
+            self.console.print(f"[green]Exported {count} check-ins to {output} ({fmt}).[/green]")
+        except Exception as e:
+            self.console.print(f"[red]Error exporting check-ins: {e}[/red]")
+
+    def import_checkins(self, path: str, fmt: str = None):
+        """
+        Stream check-ins from a CSV/NDJSON file ('-' for stdin) straight into
+        the storage in bulk, creating habits that don't exist yet.
+        """
+        try:
+            with self.storage.transaction():
+                fmt = exchange_format(path, fmt)
+                if path == "-":
+                    count, new_habits = self.storage.import_checkins(read_checkins(sys.stdin, fmt))
+                else:
+                    with open(path, "r", newline="") as f:
+                        count, new_habits = self.storage.import_checkins(read_checkins(f, fmt))
+                self.changes += count
+                self.console.print(f"[green]Imported {count} check-ins ({new_habits} new habits).[/green]")
+        except Exception as e:
+            self.console.print(f"[red]Error importing check-ins: {e}[/red]")
+
+    def convert_data(self, fmt: str):
+        """
+        Write the data of the json backend as a snapshot in the given format
+        (json or binary), switch the configuration to it and remove the old
+        snapshot and journal, which would be stale from now on.
+        """
+        try:
+            if fmt not in SNAPSHOT_FORMATS:
+                raise ValueError(f"Unknown format '{fmt}'. Choose one of: {', '.join(SNAPSHOT_FORMATS)}")
+            if self.storage.backend != "json":
+                self.console.print(f"[red]Snapshot formats only apply to the json backend (not {self.storage.backend}).[/red]")
+                return
+            if self.storage.snapshot_format == fmt:
+                self.console.print(f"[yellow]Data is already stored as {fmt}.[/yellow]")
+                return
+            target = self.snapshot_storage(fmt, seeded=False)
+            with self.storage.transaction(), target.transaction():
+                data = self.storage.data
+                if self.storage.read_only:
+                    self.console.print(f"[red]Not converting: {self.storage.path} could not be read.[/red]")
+                    return
+                target.import_data(data)
+                if target.dirty or not os.path.exists(target.path):
+                    self.console.print(f"[red]Not converting: {target.path} could not be written.[/red]")
+                    return
+                for path in (self.storage.path, self.storage.journal_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self.config.set_format(fmt)
+            self.storage = target
+            self.console.print(
+                f"[green]Converted {len(target.habits())} habits and {target.total_checkins()} "
+                f"check-ins to {fmt} ({target.path}).[/green]"
+            )
+        except Exception as e:
+            self.console.print(f"[red]Error converting data: {e}[/red]")
+
     def reset_all(self):
         try:
-            self.data = {"habits": {}, "logs": {}}
-            self.save_data()
-            self.console.print("[red]System has been reset. All habits and logs removed.[/red]")
+            with self.storage.transaction():
+                if not self.storage.habits():
+                    self.console.print("[yellow]Nothing to reset: there are no habits.[/yellow]")
+                    return
+                self.storage.reset()
+                self.changes += 1
+                self.console.print("[red]System has been reset. All habits and logs removed.[/red]")
         except Exception as e:
             self.console.print(f"[red]Error resetting system: {e}[/red]")
 
@@ -603,8 +894,41 @@ Enjoy tracking your habits!
 ####################################
 app = typer.Typer()
 
+config_started = time.perf_counter()
 config_manager = ConfigManager()
 habit_tracker = HabitTracker(config_manager)
+CONFIG_SECONDS = time.perf_counter() - config_started
+
+# Commands that never touch the user file or the habit data.
+LIGHT_COMMANDS = {"intro", "config", "setup-user", "change-username", "serve", "api"}
+
+def print_timings(command_started: float):
+    """Report where the time of this invocation went (on stderr, so output stays clean)."""
+    finished = time.perf_counter()
+    data_load = habit_tracker.storage.load_seconds
+    phases = [
+        ("imports", IMPORTED - STARTED),
+        ("config", CONFIG_SECONDS),
+        ("data load", data_load),
+        ("command", finished - command_started - data_load),
+        ("total", finished - STARTED),
+    ]
+    Console(stderr=True, soft_wrap=True).print(
+        "[dim]Timings: " + " | ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in phases) + "[/dim]"
+    )
+
+@app.callback()
+def main_callback(
+    ctx: typer.Context,
+    timings: bool = typer.Option(False, "--timings", help="Report time spent on imports, config, data load and the command."),
+):
+    """HCLI - Your Personal Habit Tracker."""
+    if timings:
+        command_started = time.perf_counter()
+        ctx.call_on_close(lambda: print_timings(command_started))
+    if ctx.invoked_subcommand not in LIGHT_COMMANDS:
+        # Touching the username loads it, asking for one on first run.
+        _ = habit_tracker.username
 
 ####################################
 # Intro Command
@@ -623,8 +947,12 @@ def config_command(
     data_file: str = typer.Option(None, "--data-file", help="Set location of habits data file"),
     user_file: str = typer.Option(None, "--user-file", help="Set location of user file"),
     root_path: str = typer.Option(None, "--root-path", help="Set a new root path."),
+    backend: str = typer.Option(None, "--backend", help="Set the storage backend (json/sqlite/sharded)."),
+    fmt: str = typer.Option(None, "--format", help="Set the snapshot format of the json backend (json/binary)."),
+    pretty_json: bool = typer.Option(None, "--pretty-json/--compact-json", help="Indent the JSON files (compact by default)."),
+    backups: int = typer.Option(None, "--backups", help="Number of rotating backups of the data file to keep."),
 ):
-    """Manage configuration, including root path, data_file, and user_file."""
+    """Manage configuration, including root path, data_file, user_file and storage backend."""
     try:
         if show:
             config_manager.show()
@@ -637,8 +965,27 @@ def config_command(
         if root_path:
             config_manager.set_root_path(root_path)
             typer.echo(f"Root path updated to {root_path}")
-
-        if show or data_file or user_file or root_path:
+        if backend:
+            config_manager.set_backend(backend)
+            typer.echo(f"Storage backend updated to {backend}")
+        if fmt:
+            if fmt not in SNAPSHOT_FORMATS:
+                raise ValueError(f"Unknown format '{fmt}'. Choose one of: {', '.join(SNAPSHOT_FORMATS)}")
+            if habit_tracker.storage.backend == "json":
+                # Converting keeps a single current snapshot, so switching
+                # never picks up an older file in the other format.
+                habit_tracker.convert_data(fmt)
+            else:
+                config_manager.set_format(fmt)
+                typer.echo(f"Snapshot format updated to {fmt}")
+        if pretty_json is not None:
+            config_manager.set_pretty_json(pretty_json)
+            typer.echo(f"JSON files will be written {'indented' if pretty_json else 'compact'}")
+        if backups is not None:
+            config_manager.set_backups(backups)
+            typer.echo(f"Keeping {backups} backups of the data file")
+
+        if show or data_file or user_file or root_path or backend or fmt or pretty_json is not None or backups is not None:
             typer.echo("Please re-run the application so changes take effect.")
     except Exception as e:
         handle_error(e, "Failed to manage config")
@@ -663,8 +1010,7 @@ def change_username():
             habit_tracker.console.print("[red]Error: Username cannot be empty![/red]")
             return
 
-        with open(habit_tracker.USER_FILE, "w") as f:
-            json.dump({"username": new_username}, f, indent=4)
+        habit_tracker.save_user(new_username)
 
         habit_tracker.console.print(f"[green]Username changed successfully to '{new_username}'![/green]")
 
@@ -710,6 +1056,22 @@ def check(
         handle_error(e, "Failed to check the habit")
         raise typer.Exit(1)
 
+@app.command("check-batch")
+def check_batch(
+    names: List[str] = typer.Argument(None, help="Names of the habits to check"),
+    date_from: str = typer.Option(None, "--from", help="First date (YYYY-MM-DD) of a range to check every habit for."),
+    date_to: str = typer.Option(None, "--to", help="Last date (YYYY-MM-DD) of the range, defaults to today."),
+    file: str = typer.Option(None, "--file", help="File with 'habit,date' lines, or '-' for stdin."),
+):
+    """
+    Check off many habits and dates in one go, with a single save.
+    """
+    try:
+        habit_tracker.check_batch(names, date_from, date_to, file)
+    except Exception as e:
+        handle_error(e, "Failed to check the habits")
+        raise typer.Exit(1)
+
 @app.command()
 def streaks():
     """Show habit streaks and the overall longest streak."""
@@ -753,21 +1115,25 @@ def summary():
         raise typer.Exit(1)
 
 @app.command()
-def reminder():
+def reminder(
+    watch: bool = typer.Option(False, "--watch", help="Keep running and announce habits as they fall due.")
+):
     """Show pending habits that need completion today (mention daily/weekly)."""
     try:
-        habit_tracker.reminder()
+        habit_tracker.reminder(watch=watch)
     except Exception as e:
         handle_error(e, "Failed to display reminders")
         raise typer.Exit(1)
 
 @app.command()
 def dashboard(
-    ascii_mode: bool = typer.Option(False, "--ascii", help="Print ASCII chart in the console.")
+    ascii_mode: bool = typer.Option(False, "--ascii", help="Print ASCII chart in the console."),
+    output: str = typer.Option(None, "--output", "-o", help="Render to a .png or .svg file instead of a window."),
+    chart: str = typer.Option("bars", "--chart", help="Chart type: bars, heatmap or timeline."),
 ):
     """Display a graphical or ASCII analysis of habit tracking."""
     try:
-        habit_tracker.dashboard(ascii_mode=ascii_mode)
+        habit_tracker.dashboard(ascii_mode=ascii_mode, output=output, chart=chart)
     except Exception as e:
         handle_error(e, "Failed to display dashboard")
         raise typer.Exit(1)
@@ -783,14 +1149,65 @@ def details(
         handle_error(e, "Failed to display habit details")
         raise typer.Exit(1)
 
+@app.command()
+def report(
+    by: str = typer.Option("month", "--by", help="Bucket size: day, week, month or year."),
+    last: int = typer.Option(6, "--last", help="Number of most recent buckets to show."),
+    habit: str = typer.Option(None, "--habit", help="Only report on this habit."),
+):
+    """Show check-ins and completion per day/week/month/year."""
+    try:
+        habit_tracker.report(by, last, habit)
+    except Exception as e:
+        handle_error(e, "Failed to generate the report")
+        raise typer.Exit(1)
+
+@app.command("export")
+def export_command(
+    output: str = typer.Option("-", "--output", "-o", help="File to write, or '-' for stdout."),
+    fmt: str = typer.Option(None, "--format", help="csv or ndjson (default: from the file extension, else csv)."),
+):
+    """Export the check-in history as CSV or NDJSON."""
+    try:
+        habit_tracker.export_checkins(output, fmt)
+    except Exception as e:
+        handle_error(e, "Failed to export check-ins")
+        raise typer.Exit(1)
+
+@app.command()
+def convert(fmt: str = typer.Argument(..., help="Snapshot format to convert to: json or binary.")):
+    """Convert the json backend's data file between the JSON and binary formats and switch to it."""
+    try:
+        habit_tracker.convert_data(fmt)
+    except Exception as e:
+        handle_error(e, "Failed to convert the data")
+        raise typer.Exit(1)
+
+@app.command("import")
+def import_command(
+    path: str = typer.Argument(..., help="File to read, or '-' for stdin."),
+    fmt: str = typer.Option(None, "--format", help="csv or ndjson (default: from the file extension, else csv)."),
+):
+    """Import check-in history from CSV or NDJSON, creating missing habits."""
+    try:
+        habit_tracker.import_checkins(path, fmt)
+    except Exception as e:
+        handle_error(e, "Failed to import check-ins")
+        raise typer.Exit(1)
+
 ##########################
 # Commands for Testing
 ##########################
 @app.command()
-def fill():
-    """Populate fake data for testing/demo (covering at least 2 months)."""
+def fill(
+    habits: int = typer.Option(None, "--habits", min=1, help="Number of habits to generate (default: the 6 sample habits)."),
+    days: int = typer.Option(60, "--days", min=1, help="Days of history before today."),
+    density: float = typer.Option(0.4, "--density", min=0.01, max=1.0, help="Average share of periods checked off."),
+    seed: int = typer.Option(None, "--seed", help="Random seed, for reproducible data."),
+):
+    """Populate fake, streaky check-in data for testing/demo (default: 2 months)."""
     try:
-        habit_tracker.fill_data()
+        habit_tracker.fill_data(habits, days, density, seed)
     except Exception as e:
         handle_error(e, "Failed to fill data")
         raise typer.Exit(1)
@@ -804,6 +1221,69 @@ def reset():
         handle_error(e, "Failed to reset the system")
         raise typer.Exit(1)
 
+####################################
+# Resident daemon
+####################################
+def run_command(argv):
+    """Run a CLI command in-process and return its exit code (used by `serve`)."""
+    try:
+        result = app(args=argv, prog_name="main.py", standalone_mode=False)
+    except Exception as e:
+        # Usage errors from typer/click know how to report themselves.
+        if hasattr(e, "show") and hasattr(e, "exit_code"):
+            e.show()
+            return e.exit_code
+        raise
+    return result if isinstance(result, int) else 0
+
+@app.command()
+def serve():
+    """
+    Keep the tracker loaded and answer commands on a local Unix socket.
+    While it runs, other invocations of this CLI are forwarded to it.
+    """
+    import daemon
+    # Ask for a username now, on our own terminal: forwarded commands never prompt.
+    _ = habit_tracker.username
+    if not os.path.exists(habit_tracker.USER_FILE):
+        habit_tracker.console.print("[red]No user set up. Run `python main.py setup-user` first.[/red]")
+        raise typer.Exit(1)
+    try:
+        path = daemon.socket_path()
+        # Load everything up front so the first forwarded command is fast too.
+        habit_tracker.storage.load()
+        habit_tracker.console.print(f"[green]Serving HCLI on {path} (Ctrl-C to stop).[/green]")
+        daemon.serve(path, run_command, before_request=habit_tracker.refresh)
+    except KeyboardInterrupt:
+        habit_tracker.console.print("[yellow]Server stopped.[/yellow]")
+    except Exception as e:
+        handle_error(e, "Failed to run the server")
+        raise typer.Exit(1)
+
+@app.command("api")
+def api_command(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to listen on."),
+    port: int = typer.Option(8787, "--port", help="TCP port to listen on."),
+    flush_interval: float = typer.Option(1.0, "--flush-interval", help="Seconds between batched writes to disk."),
+):
+    """
+    Serve add/check/details/streaks/summary/reminder as a JSON HTTP API.
+    Writes are kept in memory and persisted in batches.
+    """
+    import asyncio
+    from http_api import HabitAPI
+    try:
+        api = HabitAPI(habit_tracker, flush_interval=flush_interval)
+        ready = lambda server: habit_tracker.console.print(
+            f"[green]HCLI API listening on http://{host}:{port} (Ctrl-C to stop).[/green]"
+        )
+        asyncio.run(api.serve(host, port, ready=ready))
+    except KeyboardInterrupt:
+        habit_tracker.console.print("[yellow]API stopped.[/yellow]")
+    except Exception as e:
+        handle_error(e, "Failed to run the API")
+        raise typer.Exit(1)
+
 ####################################
 # Main Entry
 ####################################
@@ -0,0 +1,1762 @@
+import bisect
+import os
+import re
+import stat
+import struct
+import sys
+import time
+from array import array
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import codec
+from analytics import (
+    ROLLUP_GRANULARITIES, DueQueue, add_to_rollup, bucket_keys, compute_rollup, compute_streak, compute_streaks, empty_rollup, extend_streak
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+STORAGE_BACKENDS = ("json", "sqlite", "sharded")
+# Snapshot formats of the json backend.
+SNAPSHOT_FORMATS = ("json", "binary")
+EXCHANGE_FORMATS = ("csv", "ndjson")
+
+####################################
+# Check-in timestamps
+####################################
+# In memory, each habit's check-ins are an array('q') of whole seconds since
+# EPOCH (naive local time, like the ISO strings stored on disk), kept sorted
+# in ascending order. 'q' rather than 'l' because 'l' is only 32 bits on Windows.
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+LOG_TYPECODE = "q"
+
+
+def datetime_to_ts(dt):
+    return (dt - EPOCH) // ONE_SECOND
+
+
+def ts_to_datetime(ts):
+    return EPOCH + timedelta(seconds=ts)
+
+
+def iso_to_ts(iso):
+    return datetime_to_ts(datetime.fromisoformat(iso))
+
+
+def ts_to_iso(ts):
+    return ts_to_datetime(ts).isoformat()
+
+
+def empty_data():
+    return {"habits": {}, "logs": {}, "streaks": {}, "rollups": {}}
+
+
+def is_sorted(logs):
+    return all(logs[i] <= logs[i + 1] for i in range(len(logs) - 1))
+
+
+def decode_logs(data):
+    """
+    Convert the on-disk ISO strings of every habit into sorted timestamp
+    arrays, in place. Returns True if any habit's logs had to be sorted.
+    """
+    resorted = False
+    decoded = {}
+    for name, logs in data.get("logs", {}).items():
+        arr = array(LOG_TYPECODE, [iso_to_ts(log) for log in logs])
+        if not is_sorted(arr):
+            arr = array(LOG_TYPECODE, sorted(arr))
+            resorted = True
+        decoded[name] = arr
+    data["logs"] = decoded
+    return resorted
+
+
+def writable_logs(data, name):
+    """A habit's logs as a mutable array; read-only logs (see BinaryStorage) are copied on first write."""
+    logs = data["logs"].get(name)
+    if logs is None:
+        logs = data["logs"][name] = array(LOG_TYPECODE)
+    elif not isinstance(logs, array):
+        copy = array(LOG_TYPECODE)
+        copy.frombytes(logs.cast("B"))
+        logs = data["logs"][name] = copy
+    return logs
+
+
+def encode_logs(data):
+    """Return a JSON-serializable copy of data with the logs as ISO strings."""
+    encoded = dict(data)
+    encoded["rollups"] = dict(data["rollups"])
+    encoded["logs"] = {name: [ts_to_iso(ts) for ts in logs] for name, logs in data["logs"].items()}
+    return encoded
+
+
+def refresh_streak(data, name):
+    """Recompute the cached streak record of one habit from its logs."""
+    period = data["habits"].get(name, {}).get("periodicity")
+    record = compute_streak(period, data["logs"].get(name))
+    if record:
+        data["streaks"][name] = record
+    else:
+        data["streaks"].pop(name, None)
+
+
+def ensure_streaks(data):
+    """
+    Make sure every habit has an up-to-date cached streak record. Only
+    habits whose cached last check does not match their logs are rebuilt,
+    e.g. for snapshots written before the cache existed. Returns True if
+    any record changed.
+    """
+    changed = "streaks" not in data
+    streaks = data.setdefault("streaks", {})
+    stale = {}
+    for name, logs in data["logs"].items():
+        cached = streaks.get(name)
+        if not len(logs):
+            changed |= streaks.pop(name, None) is not None
+        elif not cached or cached["last"] != logs[-1]:
+            stale[name] = (data["habits"].get(name, {}).get("periodicity"), logs)
+            streaks.pop(name, None)
+    streaks.update(compute_streaks(stale))
+    return changed or bool(stale)
+
+
+def ensure_rollups(data):
+    """
+    Make sure every habit with check-ins has a rollup whose totals match
+    its logs, rebuilding the others (e.g. snapshots written before rollups).
+    Returns True if any rollup changed.
+    """
+    changed = "rollups" not in data
+    rollups = data.setdefault("rollups", {})
+    for name in list(rollups):
+        if not len(data["logs"].get(name, ())):
+            del rollups[name]
+            changed = True
+    for name, logs in data["logs"].items():
+        if isinstance(rollups, LazyMapping) and rollups.is_raw(name):
+            continue  # checked against its total by read_binary_snapshot()
+        cached = rollups.get(name)
+        if len(logs) and (not cached or sum(cached["month"].values()) != len(logs)):
+            rollups[name] = compute_rollup(logs)
+            changed = True
+    return changed
+
+
+def update_rollup(data, name, ts, count):
+    rollup = data["rollups"].setdefault(name, empty_rollup())
+    add_to_rollup(rollup, bucket_keys(ts), count)
+    if not rollup["month"]:
+        del data["rollups"][name]
+
+
+def apply_record(data, record):
+    """
+    Apply a single journal record to the in-memory data.
+    Returns the number of removed checks for 'uncheck' records, else 0.
+    """
+    op = record["op"]
+    name = record["habit"]
+    if op == "add":
+        data["habits"][name] = {
+            "periodicity": record["periodicity"],
+            "created_at": record["created_at"]
+        }
+    elif op == "check":
+        # Back-dated checks are inserted in place so logs stay sorted.
+        ts = iso_to_ts(record["at"])
+        bisect.insort(writable_logs(data, name), ts)
+        update_rollup(data, name, ts, 1)
+        cached = data["streaks"].get(name)
+        if cached and ts >= cached["last"]:
+            extend_streak(cached, data["habits"][name]["periodicity"], ts)
+        else:
+            refresh_streak(data, name)
+    elif op == "uncheck":
+        logs = data["logs"].get(name, array(LOG_TYPECODE))
+        ts = iso_to_ts(record["date"])
+        lo = bisect.bisect_left(logs, ts)
+        hi = bisect.bisect_right(logs, ts, lo)
+        if hi > lo:
+            del writable_logs(data, name)[lo:hi]
+            refresh_streak(data, name)
+            update_rollup(data, name, ts, lo - hi)
+        return hi - lo
+    elif op == "delete":
+        data["habits"].pop(name, None)
+        data["logs"].pop(name, None)
+        data["streaks"].pop(name, None)
+        data["rollups"].pop(name, None)
+    return 0
+
+
+def is_noop(record, result):
+    """True if applying record (with apply_record's result) left the data unchanged."""
+    return record["op"] == "uncheck" and not result
+
+
+####################################
+# Crash-safe file writes
+####################################
+def fsync_dir(d):
+    """Persist a rename in directory d (a no-op where directories can't be opened, e.g. Windows)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(d, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, write, mode="w"):
+    """
+    Call write(f) on a temporary file (opened with mode) next to path, fsync it and os.replace
+    it over path. Readers (and a crash at any point) only ever see the
+    complete old file or the complete new one.
+    """
+    d = os.path.dirname(path) or "."
+    if not os.path.exists(d):
+        os.makedirs(d)
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=d, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        # mkstemp creates the file as 0600; keep the mode of the file being
+        # replaced, or give a new one the usual umask-based mode.
+        try:
+            file_mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            file_mode = 0o666 & ~umask
+        os.chmod(tmp_path, file_mode)
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Also on Ctrl-C: drop the partial temp file, keep the old data file.
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_dir(d)
+
+
+def rotate_backups(path, count):
+    """Keep up to count previous versions of path as path.1 (newest) .. path.count."""
+    if count <= 0 or not os.path.exists(path):
+        return
+    for i in range(count - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    import shutil
+    shutil.copy2(path, f"{path}.1")
+
+
+####################################
+# Cross-process locking
+####################################
+class FileLock:
+    """
+    Exclusive advisory lock on a side file (fcntl.flock on POSIX, msvcrt on
+    Windows), held around read-modify-write cycles so that concurrent CLI
+    processes don't lose each other's updates. Re-entrant within a process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.depth = 0
+
+    def acquire(self):
+        if self.depth == 0:
+            d = os.path.dirname(self.path)
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        # LK_LOCK itself retries for ~10s before giving up.
+                        msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def file_signature(paths):
+    """Cheap fingerprint of a set of files, used to notice writes by other processes."""
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+
+####################################
+# JSON snapshot + journal backend
+####################################
+class ReadOnlyError(Exception):
+    """A write to data that could not be read; it would be lost once the file is repaired."""
+
+
+class JsonStorage:
+    """
+    Keeps the whole dataset in memory. It is persisted as a JSON snapshot
+    plus an append-only journal of the records applied since that snapshot.
+    """
+    backend = "json"
+    snapshot_format = "json"
+
+    # Number of journal records replayed/appended before the journal is
+    # compacted back into the JSON snapshot.
+    JOURNAL_COMPACT_THRESHOLD = 500
+
+    def __init__(self, path, journal_path, console, backups=0, seed=None):
+        self.path = path
+        self.journal_path = journal_path
+        self.console = console
+        # Storage of the other snapshot format, imported the first time
+        # this one is used (it has neither a snapshot nor a journal yet).
+        self.seed = seed
+        # Number of rotating backups (path.1 .. path.N) kept on every save.
+        self.backups = backups
+        # Indent the JSON snapshot (`config --pretty-json`); compact by default.
+        self.pretty = False
+        self.journal_entries = 0
+        # Set when the data file exists but can't be read, so that saving
+        # never replaces it with an empty dataset.
+        self.read_only = False
+        # Set when the data file can't be read and a backup was loaded instead.
+        self.recovered = False
+        self.journal_needs_newline = False
+        self.lock = FileLock(path + ".lock")
+        # Signature of the snapshot + journal when they were last read or written by us.
+        self.loaded_signature = None
+        # In write-behind mode, records are applied in memory and only
+        # journaled by flush(), many at a time.
+        self.write_behind = False
+        self.pending = []
+        # Habits changed in memory since the snapshot was last written
+        # (journaled changes included); save_data() skips the write if empty.
+        self.dirty = set()
+        self._data = None
+        self._due = None
+        # Total time spent in load(), reported by --timings.
+        self.load_seconds = 0.0
+
+    @property
+    def data(self):
+        """The dataset, parsed from disk on first access."""
+        if self._data is None:
+            self.load()
+        return self._data
+
+    def read_snapshot(self, path):
+        with open(path, "rb") as f:
+            return codec.load(f)
+
+    def decode_snapshot(self, data):
+        """Turn the logs of a snapshot just read into timestamp arrays. Returns True if any had to be sorted."""
+        return decode_logs(data)
+
+    def write_snapshot(self, path, data):
+        snapshot = encode_logs(data)
+        atomic_write(path, lambda f: codec.dump(snapshot, f, pretty=self.pretty), mode="wb")
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            return self._load()
+        finally:
+            self.load_seconds += time.perf_counter() - started
+
+    def _load(self):
+        self.read_only = False
+        self.recovered = False
+        self.loaded_signature = file_signature((self.path, self.journal_path))
+        try:
+            data = self.read_snapshot(self.path)
+        except FileNotFoundError:
+            data = empty_data()
+        except Exception as e:
+            self.console.print(f"[red]Error loading data: {e}[/red]")
+            data = self.recover_from_backup()
+        resorted = self.decode_snapshot(data)
+        rebuilt = ensure_streaks(data)
+        rebuilt = ensure_rollups(data) or rebuilt
+        self.dirty = set()
+        self.replay_journal(data)
+        # Records not flushed yet stay applied on top of what is on disk.
+        for record in self.pending:
+            apply_record(data, record)
+            self.dirty.add(record["habit"])
+        self._data = data
+        self._due = None
+        if self.seed and not self.has_files() and self.seed.has_files():
+            with self.lock:
+                # Another process may have imported the seed since we looked.
+                if self.has_files():
+                    return self._load()
+                self.import_data(self.seed.load())
+                self.loaded_signature = file_signature((self.path, self.journal_path))
+        elif (resorted or rebuilt) and os.path.exists(self.path) and not self.read_only:
+            # One-time migration of files written before logs were kept
+            # sorted or before the streak/rollup caches existed. Skipped if
+            # another process rewrote (and so migrated) them since we read them.
+            with self.lock:
+                if file_signature((self.path, self.journal_path)) == self.loaded_signature:
+                    self.save()
+                    self.loaded_signature = file_signature((self.path, self.journal_path))
+        return self._data
+
+    def has_files(self):
+        return os.path.exists(self.path) or os.path.exists(self.journal_path)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the cross-process lock for a read-modify-write cycle. If another
+        process wrote the snapshot or journal since we read them, the data is
+        re-read under the lock first, so our changes are applied on top of theirs.
+        """
+        with self.lock:
+            outermost = self.lock.depth == 1
+            if outermost and self._data is not None:
+                if file_signature((self.path, self.journal_path)) != self.loaded_signature:
+                    self.load()
+            yield
+            if outermost:
+                self.loaded_signature = file_signature((self.path, self.journal_path))
+
+    def refresh(self):
+        """Re-read the data if another process changed it since we last did."""
+        with self.transaction():
+            pass
+
+    def recover_from_backup(self):
+        """Load the newest readable backup, or mark the storage read-only."""
+        for i in range(1, self.backups + 1):
+            try:
+                data = self.read_snapshot(f"{self.path}.{i}")
+            except Exception:
+                continue
+            self.console.print(f"[yellow]Recovered data from backup {self.path}.{i}.[/yellow]")
+            self.recovered = True
+            return data
+        self.read_only = True
+        return empty_data()
+
+    def check_writable(self):
+        """Raise ReadOnlyError if the data file could not be read, so no change is accepted."""
+        if self._data is None:
+            self.load()
+        if self.read_only:
+            raise ReadOnlyError(f"Not saving: {self.path} could not be read. Repair or remove it first.")
+
+    def save(self):
+        """Write a full snapshot of the data atomically and truncate the journal."""
+        if self.read_only:
+            self.console.print(
+                f"[red]Not saving: {self.path} could not be read. Repair or remove it first.[/red]"
+            )
+            return
+        try:
+            if self.recovered and os.path.exists(self.path):
+                # Never rotate the file that failed to parse over the good
+                # backups; keep it aside for inspection instead.
+                os.replace(self.path, self.path + ".corrupt")
+                self.recovered = False
+            else:
+                rotate_backups(self.path, self.backups)
+            self.write_snapshot(self.path, self.data)
+            self.pending = []
+            self.dirty = set()
+
+            # The snapshot now covers every journaled record (tracked via
+            # journal_seq), so the journal can be dropped.
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.journal_entries = 0
+        except Exception as e:
+            self.console.print(f"[red]Error saving data: {e}[/red]")
+
+    def replay_journal(self, data):
+        """Apply journal records newer than the snapshot onto data."""
+        self.journal_entries = 0
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        # After a torn append, start the next record on a fresh line.
+        self.journal_needs_newline = bool(lines) and not lines[-1].endswith(b"\n")
+
+        applied_seq = data.get("journal_seq", 0)
+        for line in lines:
+            try:
+                record = codec.loads(line)
+            except ValueError:
+                # A torn final line from an interrupted append; ignore it.
+                continue
+            self.journal_entries += 1
+            if record.get("seq", 0) <= applied_seq:
+                continue
+            apply_record(data, record)
+            data["journal_seq"] = record["seq"]
+            self.dirty.add(record["habit"])
+
+    def apply(self, record):
+        """
+        Apply a record in memory and append it to the journal instead of
+        rewriting the whole snapshot. Compacts once the journal grows large.
+        Records that change nothing are not journaled. Returns the result of
+        apply_record.
+        """
+        self.check_writable()
+        result = apply_record(self.data, record)
+        if is_noop(record, result):
+            return result
+        self.dirty.add(record["habit"])
+        self.update_due(record["habit"])
+        if self.write_behind:
+            self.pending.append(record)
+        else:
+            self.append_journal([record])
+        return result
+
+    def flush(self):
+        """Journal the records applied in write-behind mode, with a single fsync."""
+        if not self.pending:
+            return
+        with self.transaction():
+            self.append_journal(self.pending)
+            self.pending = []
+
+    def append_journal(self, records):
+        seq = self.data.get("journal_seq", 0)
+        lines = []
+        for record in records:
+            seq += 1
+            record["seq"] = seq
+            lines.append(codec.dumps(record) + b"\n")
+        self.data["journal_seq"] = seq
+
+        d = os.path.dirname(self.journal_path)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+        with open(self.journal_path, "ab") as f:
+            if self.journal_needs_newline:
+                f.write(b"\n")
+                self.journal_needs_newline = False
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_entries += len(records)
+
+        if self.journal_entries >= self.JOURNAL_COMPACT_THRESHOLD:
+            self.save()
+
+    def apply_many(self, records):
+        """Apply a bulk of records in memory and write a single snapshot."""
+        self.check_writable()
+        for record in records:
+            apply_record(self.data, record)
+            self.dirty.add(record["habit"])
+        self._due = None
+        self.save()
+
+    def import_checkins(self, rows):
+        """
+        Bulk-load check-ins from an iterable of (habit, periodicity, ts)
+        tuples. Unknown habits are created. Logs are appended and sorted
+        once per habit at the end, then a single snapshot is written.
+        Returns (number of check-ins, number of new habits).
+        """
+        self.check_writable()
+        habits = self.data["habits"]
+        logs = self.data["logs"]
+        touched = set()
+        count = new_habits = 0
+        for name, period, ts in rows:
+            if name not in touched:
+                if name not in habits:
+                    habits[name] = {"periodicity": period, "created_at": datetime.now().isoformat()}
+                    new_habits += 1
+                writable_logs(self.data, name)
+                touched.add(name)
+            logs[name].append(ts)
+            count += 1
+
+        for name in touched:
+            if not is_sorted(logs[name]):
+                logs[name] = array(LOG_TYPECODE, sorted(logs[name]))
+        self.data["streaks"].update(compute_streaks(
+            {name: (habits[name]["periodicity"], logs[name]) for name in touched}
+        ))
+        for name in touched:
+            self.data["rollups"][name] = compute_rollup(logs[name])
+        self._due = None
+        self.dirty.update(touched)
+        if touched:
+            self.save()
+        return count, new_habits
+
+    def import_data(self, data):
+        """Take over a dataset in the JSON layout and write it as the snapshot (used by `convert`)."""
+        self._data = data
+        self._due = None
+        self.dirty.update(data["habits"])
+        self.save()
+
+    def iter_checkins(self):
+        """Yield (habit, periodicity, ts) for every check-in, habit by habit."""
+        for name, habit in self.habits().items():
+            for ts in self.logs(name):
+                yield name, habit["periodicity"], ts
+
+    def reset(self):
+        self.check_writable()
+        # Keep the journal sequence so stale journal records are never replayed.
+        journal_seq = self.data.get("journal_seq", 0)
+        self.dirty.update(self.data["habits"])
+        self._data = empty_data()
+        self._data["journal_seq"] = journal_seq
+        self._due = None
+        self.save()
+
+    ####################################
+    # Queries
+    ####################################
+    def habits(self):
+        return self.data["habits"]
+
+    def logs(self, name):
+        return self.data["logs"].get(name, array(LOG_TYPECODE))
+
+    def last_checkin(self, name):
+        logs = self.logs(name)
+        return logs[-1] if logs else None
+
+    def count_checkins(self, name, start=None, end=None):
+        """
+        Count check-ins for a habit, optionally only those in [start, end)
+        (timestamps). Logs are sorted, so a window costs two bisections.
+        """
+        logs = self.logs(name)
+        lo = 0 if start is None else bisect.bisect_left(logs, start)
+        hi = len(logs) if end is None else bisect.bisect_left(logs, end)
+        return max(hi - lo, 0)
+
+    def total_checkins(self):
+        return sum(len(logs) for logs in self.data["logs"].values())
+
+    def streak_records(self):
+        """Cached streak record per habit (habits without check-ins are absent)."""
+        return self.data["streaks"]
+
+    def rollup(self, name):
+        """Check-ins of a habit per day, ISO week and month (see analytics.ROLLUP_GRANULARITIES)."""
+        return self.data["rollups"].get(name) or empty_rollup()
+
+    def data_version(self):
+        """
+        A value that changes whenever the data does (used to key rendered
+        charts). Every write changes the files except write-behind ones,
+        which grow the pending list until flushed, so the data isn't loaded.
+        """
+        return (file_signature((self.path, self.journal_path)), len(self.pending))
+
+    def due_queue(self):
+        """Habits keyed by next due time, built from the streak cache and kept up to date by apply()."""
+        if self._due is None:
+            self._due = DueQueue.build(self.habits(), self.streak_records())
+        return self._due
+
+    def update_due(self, name):
+        if self._due is None:
+            return
+        habit = self.data["habits"].get(name)
+        if habit is None:
+            self._due.remove(name)
+            return
+        record = self.data["streaks"].get(name)
+        self._due.update(name, habit["periodicity"], record["last"] if record else None)
+
+
+####################################
+# Binary snapshots
+####################################
+# An alternative snapshot format for the json backend (`config --format
+# binary`), little-endian throughout:
+#   header    magic, format version (uint32), metadata length (uint64)
+#   metadata  compact JSON of the habits, streaks and journal_seq, plus
+#             "columns": name -> [offset, count] of its logs and
+#             "rollups": name -> [offset, length, check-ins] of its rollup
+#   padding   up to a multiple of 8 bytes
+#   columns   the sorted logs of every habit as int64 seconds since EPOCH
+#   rollups   every habit's rollup as compact JSON, back to back
+# The columns have the in-memory layout of array('q') logs, so a loaded
+# snapshot hands out memoryviews into the mapped file instead of decoding
+# it, and only the pages a command reads (e.g. the tail of a log it bisects)
+# are ever paged in. Rollups are parsed only for the habits that use them.
+BINARY_MAGIC = b"HCLIBIN\0"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<8sIQ")
+NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class LazyMapping(MutableMapping):
+    """
+    A dict whose values are decoded on first access. raw maps keys to their
+    undecoded values; decode(raw_value) turns one into the value.
+    """
+
+    def __init__(self, raw, decode):
+        self.raw = raw
+        self.decode = decode
+        self.decoded = {}
+
+    def is_raw(self, key):
+        return key in self.raw
+
+    def __getitem__(self, key):
+        if key not in self.decoded:
+            if key not in self.raw:
+                raise KeyError(key)
+            self.decoded[key] = self.decode(self.raw.pop(key))
+        return self.decoded[key]
+
+    def __setitem__(self, key, value):
+        self.raw.pop(key, None)
+        self.decoded[key] = value
+
+    def __delitem__(self, key):
+        if key in self.raw:
+            del self.raw[key]
+        else:
+            del self.decoded[key]
+
+    def __contains__(self, key):
+        return key in self.decoded or key in self.raw
+
+    def __iter__(self):
+        yield from list(self.decoded)
+        yield from list(self.raw)
+
+    def __len__(self):
+        return len(self.decoded) + len(self.raw)
+
+
+def write_binary_snapshot(f, data):
+    columns = {}
+    offset = 0
+    for name, logs in data["logs"].items():
+        columns[name] = [offset, len(logs)]
+        offset += len(logs)
+
+    # Rollups that were never decoded are copied over as they are.
+    rollups = data["rollups"]
+    blobs = []
+    blob_index = {}
+    position = 0
+    for name in rollups:
+        if isinstance(rollups, LazyMapping) and rollups.is_raw(name):
+            # Undecoded, so unchanged since it was checked against its logs.
+            blob = rollups.raw[name]
+            total = len(data["logs"].get(name, ()))
+        else:
+            blob = codec.dumps(rollups[name])
+            total = sum(rollups[name]["month"].values())
+        blobs.append(blob)
+        blob_index[name] = [position, len(blob), total]
+        position += len(blob)
+
+    meta = {key: value for key, value in data.items() if key not in ("logs", "rollups")}
+    meta["columns"] = columns
+    meta["rollups"] = blob_index
+    meta_bytes = codec.dumps(meta)
+
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(meta_bytes)))
+    f.write(meta_bytes)
+    f.write(b"\0" * (-(BINARY_HEADER.size + len(meta_bytes)) % 8))
+    for logs in data["logs"].values():
+        if NATIVE_LITTLE_ENDIAN:
+            f.write(logs)
+        else:
+            swapped = array(LOG_TYPECODE, logs)
+            swapped.byteswap()
+            f.write(swapped)
+    for blob in blobs:
+        f.write(blob)
+
+
+def map_file(path):
+    """
+    The contents of a file as a read-only buffer: memory-mapped, except on
+    Windows, where a mapped file could not be replaced by the next save.
+    """
+    with open(path, "rb") as f:
+        if os.name == "nt" or os.fstat(f.fileno()).st_size == 0:
+            return f.read()
+        import mmap
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_binary_snapshot(path):
+    """
+    Read a binary snapshot, decoding only its metadata: the logs are
+    read-only views of the (mapped) file and the rollups a LazyMapping.
+    """
+    buf = memoryview(map_file(path))
+    magic, version, meta_length = BINARY_HEADER.unpack_from(buf)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{path} is not a binary snapshot (version {BINARY_VERSION}).")
+    meta_end = BINARY_HEADER.size + meta_length
+    data = codec.loads(buf[BINARY_HEADER.size:meta_end])
+    base = meta_end + (-meta_end % 8)
+
+    logs = {}
+    for name, (offset, count) in data.pop("columns").items():
+        column = buf[base + offset * 8:base + (offset + count) * 8]
+        if len(column) != count * 8:
+            raise ValueError(f"{path} is truncated.")
+        if NATIVE_LITTLE_ENDIAN:
+            logs[name] = column.cast(LOG_TYPECODE)
+        else:
+            logs[name] = array(LOG_TYPECODE, column.tobytes())
+            logs[name].byteswap()
+    data["logs"] = logs
+
+    # A rollup whose check-in total doesn't match its logs is left out,
+    # so that ensure_rollups() rebuilds it.
+    blobs_base = base + 8 * sum(len(column) for column in logs.values())
+    raw = {}
+    for name, (offset, length, total) in data["rollups"].items():
+        if total == len(logs.get(name, ())):
+            raw[name] = buf[blobs_base + offset:blobs_base + offset + length]
+    data["rollups"] = LazyMapping(raw, codec.loads)
+    return data
+
+
+class BinaryStorage(JsonStorage):
+    """
+    The json backend with a binary snapshot (see above) instead of a JSON
+    one; the journal is the same. Loading maps the file and decodes nothing
+    but the metadata: logs stay views into the mapping until written to.
+    """
+    snapshot_format = "binary"
+
+    def read_snapshot(self, path):
+        return read_binary_snapshot(path)
+
+    def decode_snapshot(self, data):
+        # Logs are written sorted and are already timestamps.
+        return False
+
+    def write_snapshot(self, path, data):
+        atomic_write(path, lambda f: write_binary_snapshot(f, data), mode="wb")
+
+
+####################################
+# Sharded JSON backend
+####################################
+def shard_file_name(name):
+    """File name of a habit's shard: a readable prefix of the name plus a hash, safe for any name."""
+    prefix = re.sub(r"[^A-Za-z0-9_-]+", "_", name)[:40]
+    import hashlib
+    return f"{prefix}-{hashlib.sha1(name.encode()).hexdigest()[:10]}.json"
+
+
+def empty_manifest():
+    return {"habits": {}, "streaks": {}, "checkins": {}}
+
+
+class ShardedStorage:
+    """
+    Keeps the habits, their cached streak records and check-in counts in a
+    small manifest, and every habit's logs (with its rollup) in a shard file
+    of its own. Listing habits, streaks or pending habits reads only the
+    manifest; a habit's shard is read the first time its logs are needed,
+    and a write rewrites just the shards of the habits it changed. Shards
+    hold the logs as timestamps (see EPOCH) rather than ISO strings, so
+    reading and writing them needs no date conversions.
+    """
+    backend = "sharded"
+
+    def __init__(self, directory, console, seed_file=None):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.console = console
+        # JSON snapshot imported the first time the manifest is created.
+        self.seed_file = seed_file
+        self.read_only = False
+        self.lock = FileLock(self.manifest_path + ".lock")
+        # Every write rewrites the manifest, so its signature covers the shards too.
+        self.loaded_signature = None
+        # In write-behind mode, records are applied in memory and their
+        # shards only written by flush().
+        self.write_behind = False
+        self.pending = []
+        # Habits whose shard changed in memory since it was last written.
+        self.dirty = set()
+        self._manifest = None
+        # Loaded shards: name -> logs / rollup.
+        self._logs = {}
+        self._rollups = {}
+        self._due = None
+        self.load_seconds = 0.0
+
+    @property
+    def manifest(self):
+        """The manifest, read from disk on first access."""
+        if self._manifest is None:
+            self.load()
+        return self._manifest
+
+    @property
+    def data(self):
+        """The whole dataset in the JSON layout (reads every shard)."""
+        return self.view(self.habits())
+
+    def view(self, names=()):
+        """
+        The loaded part of the dataset in the JSON layout, after loading the
+        shards of names. Its dicts are the storage's own, so apply_record()
+        on the view updates the manifest and the shards in place.
+        """
+        for name in names:
+            self.load_shard(name)
+        return {
+            "habits": self.manifest["habits"],
+            "logs": self._logs,
+            "streaks": self.manifest["streaks"],
+            "rollups": self._rollups
+        }
+
+    def shard_path(self, name):
+        return os.path.join(self.directory, shard_file_name(name))
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            return self._load()
+        finally:
+            self.load_seconds += time.perf_counter() - started
+
+    def _load(self):
+        """Read the manifest only; shards are read per habit by load_shard()."""
+        self.read_only = False
+        self.loaded_signature = file_signature((self.manifest_path,))
+        self._logs = {}
+        self._rollups = {}
+        self._due = None
+        self.dirty = set()
+        try:
+            with open(self.manifest_path, "rb") as f:
+                self._manifest = codec.load(f)
+        except FileNotFoundError:
+            self._manifest = empty_manifest()
+            if self.seed_file and os.path.exists(self.seed_file):
+                with self.lock:
+                    # Another process may have imported the seed since we looked.
+                    if os.path.exists(self.manifest_path):
+                        return self._load()
+                    seed = JsonStorage(self.seed_file, self.seed_file + ".journal", self.console).load()
+                    self.import_data(seed)
+                    self.loaded_signature = file_signature((self.manifest_path,))
+        except Exception as e:
+            self.console.print(f"[red]Error loading data: {e}[/red]")
+            self._manifest = empty_manifest()
+            self.read_only = True
+        # Records not flushed yet stay applied on top of what is on disk.
+        for record in self.pending:
+            self._apply(record)
+        return self._manifest
+
+    def load_shard(self, name):
+        """The logs of a habit, reading its shard on first use."""
+        logs = self._logs.get(name)
+        if logs is not None:
+            return logs
+        logs = array(LOG_TYPECODE)
+        rollup = None
+        if name in self.manifest["habits"]:
+            try:
+                with open(self.shard_path(name), "rb") as f:
+                    shard = codec.load(f)
+                logs = array(LOG_TYPECODE, shard["logs"])
+                rollup = shard.get("rollup")
+            except FileNotFoundError:
+                pass
+            if not is_sorted(logs):
+                logs = array(LOG_TYPECODE, sorted(logs))
+        self._logs[name] = logs
+
+        # A shard written without its manifest (e.g. a crash in between)
+        # wins: the manifest entries are rebuilt from it.
+        manifest = self.manifest
+        if name in manifest["habits"]:
+            cached = manifest["streaks"].get(name)
+            last = logs[-1] if logs else None
+            if manifest["checkins"].get(name, 0) != len(logs) or (cached["last"] if cached else None) != last:
+                refresh_streak(self.view(), name)
+                manifest["checkins"][name] = len(logs)
+                self.dirty.add(name)
+        if len(logs):
+            if not rollup or sum(rollup["month"].values()) != len(logs):
+                rollup = compute_rollup(logs)
+            self._rollups[name] = rollup
+        return logs
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the cross-process lock for a read-modify-write cycle. If another
+        process wrote since we read the manifest, the cached manifest and
+        shards are dropped first, so our changes are applied on top of theirs.
+        """
+        with self.lock:
+            outermost = self.lock.depth == 1
+            if outermost and self._manifest is not None:
+                if file_signature((self.manifest_path,)) != self.loaded_signature:
+                    self.load()
+            yield
+            if outermost:
+                self.loaded_signature = file_signature((self.manifest_path,))
+
+    def refresh(self):
+        """Re-read the manifest if another process changed it since we last did."""
+        with self.transaction():
+            pass
+
+    def check_writable(self):
+        """Raise ReadOnlyError if the manifest could not be read, so no change is accepted."""
+        if self._manifest is None:
+            self.load()
+        if self.read_only:
+            raise ReadOnlyError(f"Not saving: {self.manifest_path} could not be read. Repair or remove it first.")
+
+    def save(self):
+        """Write the shards of the changed habits, then the manifest that accounts for them."""
+        if self.read_only:
+            self.console.print(
+                f"[red]Not saving: {self.manifest_path} could not be read. Repair or remove it first.[/red]"
+            )
+            return
+        try:
+            habits = self.manifest["habits"]
+            for name in self.dirty:
+                if name in habits:
+                    shard = {
+                        "habit": name,
+                        "logs": self._logs[name].tolist(),
+                        "rollup": self._rollups.get(name) or empty_rollup()
+                    }
+                    atomic_write(self.shard_path(name), lambda f: codec.dump(shard, f), mode="wb")
+            atomic_write(self.manifest_path, lambda f: codec.dump(self.manifest, f), mode="wb")
+            for name in self.dirty:
+                if name not in habits and os.path.exists(self.shard_path(name)):
+                    os.remove(self.shard_path(name))
+            self.dirty = set()
+            self.pending = []
+        except Exception as e:
+            self.console.print(f"[red]Error saving data: {e}[/red]")
+
+    def _apply(self, record):
+        name = record["habit"]
+        data = self.view((name,))
+        result = apply_record(data, record)
+        if is_noop(record, result):
+            return result
+        if name in data["habits"]:
+            self.manifest["checkins"][name] = len(data["logs"][name])
+        else:
+            self.manifest["checkins"].pop(name, None)
+            self._logs.pop(name, None)
+        self.dirty.add(name)
+        return result
+
+    def apply(self, record):
+        """
+        Apply a record and rewrite the shard of its habit (in write-behind
+        mode, on flush()). Records that change nothing write nothing.
+        """
+        self.check_writable()
+        result = self._apply(record)
+        if is_noop(record, result):
+            return result
+        self.update_due(record["habit"])
+        if self.write_behind:
+            self.pending.append(record)
+        else:
+            self.save()
+        return result
+
+    def flush(self):
+        """Write the shards changed in write-behind mode."""
+        if not self.pending:
+            return
+        with self.transaction():
+            self.save()
+
+    def apply_many(self, records):
+        """Apply a bulk of records and write each changed shard once."""
+        self.check_writable()
+        for record in records:
+            self._apply(record)
+        self._due = None
+        self.save()
+
+    def import_data(self, data):
+        """Take over a dataset in the JSON layout (used to seed a new manifest)."""
+        manifest = self.manifest
+        manifest["habits"].update(data["habits"])
+        for name, logs in data["logs"].items():
+            self._logs[name] = logs
+            manifest["checkins"][name] = len(logs)
+        manifest["streaks"].update(data["streaks"])
+        self._rollups.update(data["rollups"])
+        self.dirty.update(data["habits"])
+        self.save()
+
+    def import_checkins(self, rows):
+        """
+        Bulk-load check-ins from an iterable of (habit, periodicity, ts)
+        tuples, creating unknown habits. Only the shards of habits that got
+        check-ins are read and rewritten.
+        Returns (number of check-ins, number of new habits).
+        """
+        self.check_writable()
+        habits = self.manifest["habits"]
+        logs = self._logs
+        touched = set()
+        count = new_habits = 0
+        for name, period, ts in rows:
+            if name not in touched:
+                if name not in habits:
+                    habits[name] = {"periodicity": period, "created_at": datetime.now().isoformat()}
+                    new_habits += 1
+                self.load_shard(name)
+                touched.add(name)
+            logs[name].append(ts)
+            count += 1
+
+        for name in touched:
+            if not is_sorted(logs[name]):
+                logs[name] = array(LOG_TYPECODE, sorted(logs[name]))
+            self.manifest["checkins"][name] = len(logs[name])
+            self._rollups[name] = compute_rollup(logs[name])
+        self.manifest["streaks"].update(compute_streaks(
+            {name: (habits[name]["periodicity"], logs[name]) for name in touched}
+        ))
+        self.dirty.update(touched)
+        self._due = None
+        if touched:
+            self.save()
+        return count, new_habits
+
+    def iter_checkins(self):
+        """Yield (habit, periodicity, ts) for every check-in, habit by habit."""
+        for name, habit in self.habits().items():
+            for ts in self.logs(name):
+                yield name, habit["periodicity"], ts
+
+    def reset(self):
+        self.check_writable()
+        self.dirty.update(self.manifest["habits"])
+        self._manifest = empty_manifest()
+        self._logs = {}
+        self._rollups = {}
+        self._due = None
+        self.save()
+
+    ####################################
+    # Queries
+    ####################################
+    def habits(self):
+        return self.manifest["habits"]
+
+    def logs(self, name):
+        if name not in self.habits():
+            return array(LOG_TYPECODE)
+        return self.load_shard(name)
+
+    def last_checkin(self, name):
+        record = self.manifest["streaks"].get(name)
+        return record["last"] if record else None
+
+    def count_checkins(self, name, start=None, end=None):
+        """Count check-ins for a habit, optionally only those in [start, end); totals come from the manifest."""
+        if start is None and end is None:
+            return self.manifest["checkins"].get(name, 0)
+        logs = self.logs(name)
+        lo = 0 if start is None else bisect.bisect_left(logs, start)
+        hi = len(logs) if end is None else bisect.bisect_left(logs, end)
+        return max(hi - lo, 0)
+
+    def total_checkins(self):
+        return sum(self.manifest["checkins"].values())
+
+    def streak_records(self):
+        """Cached streak record per habit (habits without check-ins are absent)."""
+        return self.manifest["streaks"]
+
+    def rollup(self, name):
+        if name not in self.habits():
+            return empty_rollup()
+        self.load_shard(name)
+        return self._rollups.get(name) or empty_rollup()
+
+    def data_version(self):
+        return (file_signature((self.manifest_path,)), len(self.pending))
+
+    def due_queue(self):
+        if self._due is None:
+            self._due = DueQueue.build(self.habits(), self.streak_records())
+        return self._due
+
+    def update_due(self, name):
+        if self._due is None:
+            return
+        habit = self.habits().get(name)
+        if habit is None:
+            self._due.remove(name)
+            return
+        record = self.manifest["streaks"].get(name)
+        self._due.update(name, habit["periodicity"], record["last"] if record else None)
+
+
+####################################
+# SQLite backend
+####################################
+class SqliteStorage:
+    """
+    Stores habits and check-ins in an SQLite database. Queries run against
+    an index on (habit, ts) instead of loading every log into memory.
+    """
+    backend = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS habits (
+            name TEXT PRIMARY KEY,
+            periodicity TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS checkins (
+            habit TEXT NOT NULL,
+            ts INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS checkins_habit_ts ON checkins (habit, ts);
+        CREATE TABLE IF NOT EXISTS streaks (
+            habit TEXT PRIMARY KEY,
+            current INTEGER NOT NULL,
+            start INTEGER NOT NULL,
+            last INTEGER NOT NULL,
+            longest INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rollups (
+            habit TEXT NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (habit, granularity, bucket)
+        );
+    """
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path, console, seed_file=None):
+        self.path = path
+        self.console = console
+        # JSON snapshot imported the first time the database is created.
+        self.seed_file = seed_file
+        self.lock = FileLock(path + ".lock")
+        # In write-behind mode, records are buffered in memory and executed
+        # by flush() in one short transaction under the lock, so no SQLite
+        # write lock is held between writes. Queries overlay them (see
+        # buffered()) rather than flushing, so reads never commit.
+        self.write_behind = False
+        self.pending = []
+        # Habits with buffered write-behind records.
+        self.dirty = set()
+        self._conn = None
+        self._due = None
+        self.load_seconds = 0.0
+
+    @property
+    def conn(self):
+        """The database connection, opened on first access."""
+        if self._conn is None:
+            self.load()
+        return self._conn
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            self._load()
+        finally:
+            self.load_seconds += time.perf_counter() - started
+
+    def _load(self):
+        d = os.path.dirname(self.path)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+
+        try:
+            # Wait for other processes' write transactions instead of failing.
+            # The HTTP API uses the storage from a worker thread, one request at a time.
+            import sqlite3
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            # Reading the version is not a write, so current databases are
+            # opened without the lock (read-only commands never wait for it).
+            if self.schema_version() < self.SCHEMA_VERSION:
+                with self.lock:
+                    self.setup()
+        except Exception as e:
+            self.console.print(f"[red]Error loading data: {e}[/red]")
+
+    def schema_version(self):
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def setup(self):
+        """
+        Create and seed a new database. Called under the lock, so two
+        processes opening it for the first time don't both import the seed.
+        """
+        if self.schema_version() >= self.SCHEMA_VERSION:
+            # Another process set it up while we waited for the lock.
+            return
+        self._conn.executescript(self.SCHEMA)
+        if self.seed_file and os.path.exists(self.seed_file):
+            seed = JsonStorage(self.seed_file, self.seed_file + ".journal", self.console).load()
+            self.import_data(seed)
+        # Set last: processes that find it set open the database without the lock.
+        self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @contextmanager
+    def transaction(self):
+        """Hold the cross-process lock for a read-modify-write cycle."""
+        with self.lock:
+            yield
+
+    def refresh(self):
+        # Every query reads the database; only the due queue may be stale.
+        self._due = None
+
+    def import_data(self, data):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO habits (name, periodicity, created_at) VALUES (?, ?, ?)",
+                [(name, h["periodicity"], h["created_at"]) for name, h in data["habits"].items()]
+            )
+            self.conn.executemany(
+                "INSERT INTO checkins (habit, ts) VALUES (?, ?)",
+                [(name, ts) for name, logs in data["logs"].items() for ts in logs]
+            )
+            self.refresh_all_streaks()
+            self.refresh_all_rollups()
+
+    @property
+    def data(self):
+        """Read-only snapshot of the whole database in the JSON layout."""
+        data = {"habits": self.habits(), "logs": {}, "streaks": self.streak_records(), "rollups": {}}
+        for habit, ts in self.conn.execute("SELECT habit, ts FROM checkins ORDER BY habit, ts"):
+            data["logs"].setdefault(habit, array(LOG_TYPECODE)).append(ts)
+        for habit in self.dirty:
+            logs = self.logs(habit)
+            if len(logs):
+                data["logs"][habit] = logs
+            else:
+                data["logs"].pop(habit, None)
+        for habit in data["logs"]:
+            data["rollups"][habit] = self.rollup(habit)
+        return data
+
+    def save(self):
+        self.flush()
+
+    def _execute(self, record):
+        op = record["op"]
+        name = record["habit"]
+        if op == "add":
+            self.conn.execute(
+                "INSERT OR REPLACE INTO habits (name, periodicity, created_at) VALUES (?, ?, ?)",
+                (name, record["periodicity"], record["created_at"])
+            )
+        elif op == "check":
+            ts = iso_to_ts(record["at"])
+            self.conn.execute("INSERT INTO checkins (habit, ts) VALUES (?, ?)", (name, ts))
+            self.update_rollup(name, ts, 1)
+            cached = self.streak_records(name).get(name)
+            if cached and ts >= cached["last"]:
+                self.store_streak(name, extend_streak(cached, self.periodicity(name), ts))
+            else:
+                self.refresh_streak(name)
+        elif op == "uncheck":
+            cur = self.conn.execute(
+                "DELETE FROM checkins WHERE habit = ? AND ts = ?", (name, iso_to_ts(record["date"]))
+            )
+            if cur.rowcount:
+                self.refresh_streak(name)
+                self.update_rollup(name, iso_to_ts(record["date"]), -cur.rowcount)
+            return cur.rowcount
+        elif op == "delete":
+            self.conn.execute("DELETE FROM habits WHERE name = ?", (name,))
+            self.conn.execute("DELETE FROM checkins WHERE habit = ?", (name,))
+            self.conn.execute("DELETE FROM streaks WHERE habit = ?", (name,))
+            self.conn.execute("DELETE FROM rollups WHERE habit = ?", (name,))
+        return 0
+
+    def update_rollup(self, name, ts, count):
+        for granularity, bucket in zip(ROLLUP_GRANULARITIES, bucket_keys(ts)):
+            self.conn.execute(
+                "INSERT INTO rollups (habit, granularity, bucket, count) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (habit, granularity, bucket) DO UPDATE SET count = count + excluded.count",
+                (name, granularity, bucket, count)
+            )
+        self.conn.execute("DELETE FROM rollups WHERE habit = ? AND count <= 0", (name,))
+
+    def refresh_all_rollups(self):
+        self.conn.execute("DELETE FROM rollups")
+        for name in self.habits():
+            self.store_rollup(name, compute_rollup(self.logs(name)))
+
+    def refresh_rollup(self, name):
+        """Recompute the rollup of one habit from its logs."""
+        self.conn.execute("DELETE FROM rollups WHERE habit = ?", (name,))
+        self.store_rollup(name, compute_rollup(self.logs(name)))
+
+    def store_rollup(self, name, rollup):
+        self.conn.executemany(
+            "INSERT INTO rollups (habit, granularity, bucket, count) VALUES (?, ?, ?, ?)",
+            [(name, g, bucket, count) for g in ROLLUP_GRANULARITIES for bucket, count in rollup[g].items()]
+        )
+
+    def store_streak(self, name, record):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO streaks (habit, current, start, last, longest) VALUES (?, ?, ?, ?, ?)",
+            (name, record["current"], record["start"], record["last"], record["longest"])
+        )
+
+    def refresh_all_streaks(self):
+        habit_logs = {name: (h["periodicity"], self.logs(name)) for name, h in self.habits().items()}
+        self.conn.execute("DELETE FROM streaks")
+        for name, record in compute_streaks(habit_logs).items():
+            self.store_streak(name, record)
+
+    def refresh_streak(self, name):
+        """Recompute the cached streak record of one habit from its logs."""
+        record = compute_streak(self.periodicity(name), self.logs(name))
+        if record:
+            self.store_streak(name, record)
+        else:
+            self.conn.execute("DELETE FROM streaks WHERE habit = ?", (name,))
+
+    def apply(self, record):
+        """
+        Execute a record in its own transaction. In write-behind mode it is
+        only buffered until flush() and 0 is returned.
+        """
+        if self.write_behind:
+            self.pending.append(record)
+            self.dirty.add(record["habit"])
+            self._due = None
+            return 0
+        self.flush()
+        with self.conn:
+            result = self._execute(record)
+        self.update_due(record["habit"])
+        return result
+
+    def flush(self):
+        """Execute the records buffered in write-behind mode in a single transaction."""
+        if not self.pending:
+            return
+        records, self.pending = self.pending, []
+        try:
+            with self.transaction(), self.conn:
+                for record in records:
+                    self._execute(record)
+        except BaseException:
+            self.pending = records + self.pending
+            raise
+        self.dirty = set()
+        self._due = None
+
+    def apply_many(self, records):
+        self.flush()
+        with self.conn:
+            for record in records:
+                self._execute(record)
+        self._due = None
+
+    def import_checkins(self, rows):
+        """
+        Stream check-ins from (habit, periodicity, ts) tuples in one
+        transaction. Only the streaks and rollups of habits that got
+        check-ins are recomputed.
+        """
+        known = set(self.habits())
+        new_habits = {}
+        touched = set()
+        counter = {"count": 0}
+
+        def checkins():
+            for name, period, ts in rows:
+                if name not in known and name not in new_habits:
+                    new_habits[name] = period
+                touched.add(name)
+                counter["count"] += 1
+                yield name, ts
+
+        self.flush()
+        with self.conn:
+            self.conn.executemany("INSERT INTO checkins (habit, ts) VALUES (?, ?)", checkins())
+            created_at = datetime.now().isoformat()
+            self.conn.executemany(
+                "INSERT INTO habits (name, periodicity, created_at) VALUES (?, ?, ?)",
+                [(name, period, created_at) for name, period in new_habits.items()]
+            )
+            for name in touched:
+                self.refresh_streak(name)
+                self.refresh_rollup(name)
+        self._due = None
+        return counter["count"], len(new_habits)
+
+    def iter_checkins(self):
+        rows = self.conn.execute(
+            "SELECT c.habit, h.periodicity, c.ts FROM checkins c JOIN habits h ON h.name = c.habit"
+            " ORDER BY c.habit, c.ts"
+        )
+        for row in rows:
+            yield row
+
+    def reset(self):
+        self.pending = []
+        self.dirty = set()
+        with self.conn:
+            self.conn.execute("DELETE FROM habits")
+            self.conn.execute("DELETE FROM checkins")
+            self.conn.execute("DELETE FROM streaks")
+            self.conn.execute("DELETE FROM rollups")
+        self._due = None
+
+    ####################################
+    # Queries
+    ####################################
+    def buffered(self, name):
+        """
+        The data of a habit in the JSON layout with its buffered write-behind
+        records applied, or None if it has none. Queries about such a habit
+        read it instead of the database.
+        """
+        records = [record for record in self.pending if record["habit"] == name]
+        if not records:
+            return None
+        data = {"habits": {}, "logs": {}, "streaks": {}, "rollups": {}}
+        row = self.conn.execute("SELECT periodicity, created_at FROM habits WHERE name = ?", (name,)).fetchone()
+        if row:
+            data["habits"][name] = {"periodicity": row[0], "created_at": row[1]}
+            data["logs"][name] = self.stored_logs(name)
+            data["streaks"].update(self.stored_streaks(name))
+            rollup = self.stored_rollup(name)
+            if rollup["month"]:
+                data["rollups"][name] = rollup
+        for record in records:
+            apply_record(data, record)
+        return data
+
+    def habits(self):
+        rows = self.conn.execute("SELECT name, periodicity, created_at FROM habits ORDER BY rowid")
+        habits = {name: {"periodicity": p, "created_at": c} for name, p, c in rows}
+        for record in self.pending:
+            if record["op"] == "add":
+                habits[record["habit"]] = {"periodicity": record["periodicity"], "created_at": record["created_at"]}
+            elif record["op"] == "delete":
+                habits.pop(record["habit"], None)
+        return habits
+
+    def periodicity(self, name):
+        buffered = self.buffered(name)
+        if buffered is not None:
+            return buffered["habits"].get(name, {}).get("periodicity")
+        row = self.conn.execute("SELECT periodicity FROM habits WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def logs(self, name):
+        buffered = self.buffered(name)
+        if buffered is not None:
+            return buffered["logs"].get(name, array(LOG_TYPECODE))
+        return self.stored_logs(name)
+
+    def stored_logs(self, name):
+        rows = self.conn.execute("SELECT ts FROM checkins WHERE habit = ? ORDER BY ts", (name,))
+        return array(LOG_TYPECODE, [ts for (ts,) in rows])
+
+    def last_checkin(self, name):
+        buffered = self.buffered(name)
+        if buffered is not None:
+            logs = buffered["logs"].get(name)
+            return logs[-1] if logs else None
+        return self.conn.execute("SELECT MAX(ts) FROM checkins WHERE habit = ?", (name,)).fetchone()[0]
+
+    def count_checkins(self, name, start=None, end=None):
+        buffered = self.buffered(name)
+        if buffered is not None:
+            logs = buffered["logs"].get(name, array(LOG_TYPECODE))
+            lo = 0 if start is None else bisect.bisect_left(logs, start)
+            hi = len(logs) if end is None else bisect.bisect_left(logs, end)
+            return max(hi - lo, 0)
+        query = "SELECT COUNT(*) FROM checkins WHERE habit = ?"
+        params = [name]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND ts < ?"
+            params.append(end)
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def total_checkins(self):
+        total = self.conn.execute("SELECT COUNT(*) FROM checkins").fetchone()[0]
+        for name in self.dirty:
+            buffered = self.buffered(name)
+            if buffered is not None:
+                total += len(buffered["logs"].get(name, ())) - len(self.stored_logs(name))
+        return total
+
+    def streak_records(self, name=None):
+        """Cached streak record per habit, or only for the given habit."""
+        records = self.stored_streaks(name)
+        for habit in [name] if name else self.dirty:
+            buffered = self.buffered(habit)
+            if buffered is not None:
+                records.pop(habit, None)
+                records.update(buffered["streaks"])
+        return records
+
+    def stored_streaks(self, name=None):
+        query = "SELECT habit, current, start, last, longest FROM streaks"
+        rows = self.conn.execute(query + " WHERE habit = ?", (name,)) if name else self.conn.execute(query)
+        return {
+            habit: {"current": current, "start": start, "last": last, "longest": longest}
+            for habit, current, start, last, longest in rows
+        }
+
+    def data_version(self):
+        return (file_signature((self.path,)), len(self.pending))
+
+    def due_queue(self):
+        if self._due is None:
+            self._due = DueQueue.build(self.habits(), self.streak_records())
+        return self._due
+
+    def update_due(self, name):
+        if self._due is None:
+            return
+        period = self.periodicity(name)
+        if period is None:
+            self._due.remove(name)
+            return
+        record = self.streak_records(name).get(name)
+        self._due.update(name, period, record["last"] if record else None)
+
+    def rollup(self, name):
+        buffered = self.buffered(name)
+        if buffered is not None:
+            return buffered["rollups"].get(name) or empty_rollup()
+        return self.stored_rollup(name)
+
+    def stored_rollup(self, name):
+        rollup = empty_rollup()
+        rows = self.conn.execute(
+            "SELECT granularity, bucket, count FROM rollups WHERE habit = ? ORDER BY bucket", (name,)
+        )
+        for granularity, bucket, count in rows:
+            rollup[granularity][bucket] = count
+        return rollup
+
+
+####################################
+# Streaming import / export
+####################################
+# Check-in history is exchanged one check-in per row/line:
+#   csv:    habit,periodicity,at
+#   ndjson: {"habit": ..., "periodicity": ..., "at": ...}
+# with "at" an ISO-8601 timestamp and periodicity optional on import.
+
+def exchange_format(path, fmt=None):
+    """Pick the exchange format from an explicit value or the file extension."""
+    if fmt:
+        if fmt not in EXCHANGE_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Choose one of: {', '.join(EXCHANGE_FORMATS)}")
+        return fmt
+    if path and os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return "csv"
+
+
+def read_checkins(f, fmt, default_period="daily"):
+    """Yield (habit, periodicity, ts) tuples from an open file, one row at a time."""
+    if fmt == "ndjson":
+        rows = (codec.loads(line) for line in f if line.strip())
+    else:
+        import csv
+        rows = csv.DictReader(f)
+    for row in rows:
+        yield row["habit"], row.get("periodicity") or default_period, iso_to_ts(row["at"])
+
+
+def write_checkins(f, rows, fmt):
+    """
+    Write (habit, periodicity, ts) tuples to an open file, one row at a time.
+    Returns the number of check-ins written.
+    """
+    count = 0
+    if fmt == "ndjson":
+        for name, period, ts in rows:
+            f.write(codec.dumps({"habit": name, "periodicity": period, "at": ts_to_iso(ts)}).decode() + "\n")
+            count += 1
+    else:
+        import csv
+        writer = csv.writer(f)
+        writer.writerow(["habit", "periodicity", "at"])
+        for name, period, ts in rows:
+            writer.writerow([name, period, ts_to_iso(ts)])
+            count += 1
+    return count
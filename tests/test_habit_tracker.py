@@ -1,35 +1,57 @@
 # tests/test_habit_tracker.py
 
 import pytest
+import importlib.util
 import os
+import random
+import subprocess
+import sys
+import json
+import signal
+import sqlite3
+import time
+from array import array
 import shutil
 from datetime import datetime, timedelta
-from main import app, habit_tracker, config_manager  # Import from your main code
+import main
+from main import app, ConfigManager, HabitTracker  # Import from your main code
+from storage import ReadOnlyError, iso_to_ts, ts_to_iso
+import analytics
+import codec
+import daemon
+import asyncio
+from http_api import HabitAPI
 from typer.testing import CliRunner
 
 runner = CliRunner()
 
 @pytest.fixture(autouse=True)
-def run_before_and_after_tests():
+def run_before_and_after_tests(tmp_path, monkeypatch):
     """
     A fixture that runs before and after each test.
-    Cleans up or sets up as needed.
-    """
-    # Before each test: ensure we start fresh
-    if os.path.exists(habit_tracker.DATA_FILE):
-        os.remove(habit_tracker.DATA_FILE)
-    if os.path.exists(habit_tracker.USER_FILE):
-        os.remove(habit_tracker.USER_FILE)
-    if os.path.exists(config_manager.CONFIG_FILE):
-        os.remove(config_manager.CONFIG_FILE)
-    yield
-    # After each test: also remove any leftover files
-    if os.path.exists(habit_tracker.DATA_FILE):
-        os.remove(habit_tracker.DATA_FILE)
-    if os.path.exists(habit_tracker.USER_FILE):
-        os.remove(habit_tracker.USER_FILE)
-    if os.path.exists(config_manager.CONFIG_FILE):
-        os.remove(config_manager.CONFIG_FILE)
+    Every test starts in an empty temporary directory, with the CLI's config
+    and tracker rebuilt there, so the repository's config.json and data
+    files are never read, written or removed.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "config_manager", ConfigManager())
+    monkeypatch.setattr(main, "habit_tracker", HabitTracker(main.config_manager))
+
+@pytest.fixture
+def make_tracker(tmp_path):
+    """
+    A factory of HabitTrackers keeping their files in root (tmp_path by
+    default) for a user set up as Tester. Config keys are passed as keyword
+    arguments. Every call opens the files afresh, like a new CLI process.
+    """
+    def make(root=tmp_path, user="Tester", **config):
+        root.mkdir(parents=True, exist_ok=True)
+        if user and not (root / "user.json").exists():
+            (root / "user.json").write_text(json.dumps({"username": user}))
+        cm = ConfigManager()
+        cm.config_data.update({"rootPath": str(root), **config})
+        return HabitTracker(cm)
+    return make
 
 def test_setup_user():
     """
@@ -107,6 +129,32 @@ def test_fill_data():
     assert result.exit_code == 0
     assert "Fake data added successfully" in result.output
 
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_fill_is_seeded_and_streaky(tmp_path, backend, make_tracker):
+    """
+    Test that `fill` options shape the generated history and a seed reproduces it.
+    """
+    histories = []
+    for run in ("a", "b"):
+        tracker = make_tracker(tmp_path / run, backend=backend)
+        tracker.fill_data(habits=8, days=200, density=0.5, seed=42)
+        histories.append(list(tracker.storage.iter_checkins()))
+
+    assert histories[0] == histories[1]
+    habits = tracker.storage.habits()
+    assert list(habits)[:6] == [name for name, _ in analytics.SAMPLE_HABITS]
+    assert len(habits) == 8 and habits["Habit8"]["periodicity"] == "weekly"
+
+    logs = tracker.storage.logs("Workout")
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    assert iso_to_ts((today - timedelta(days=200)).isoformat()) <= logs[0]
+    assert logs[-1] < iso_to_ts(today.isoformat())
+    # Daily habits check in at most once a day and in runs, not at random.
+    days = [ts // analytics.SECONDS_PER_DAY for ts in logs]
+    assert len(set(days)) == len(days)
+    assert 0.3 * 200 < len(days) < 0.7 * 200
+    assert tracker.storage.streak_records()["Workout"]["longest"] >= 3
+
 def test_summary():
     """
     Test the `summary` command with some data.
@@ -135,3 +183,846 @@ def test_reminder():
     assert result.exit_code == 0
     # It should mention "You have pending habits to complete" or show "Meditation"
     assert "Meditation (daily)" in result.output or "You have pending habits" in result.output
+
+def test_check_appends_to_journal():
+    """
+    Test that a check is journaled instead of rewriting the snapshot,
+    and that a fresh tracker replays the journal.
+    """
+    runner.invoke(app, ["setup-user"], input="Tester\n")
+    runner.invoke(app, ["add", "Journaled", "daily"])
+    main.habit_tracker.save_data()
+    result = runner.invoke(app, ["check", "Journaled", "--date", "2021-01-02"])
+    assert result.exit_code == 0
+
+    with open(main.habit_tracker.DATA_FILE) as f:
+        assert "2021-01-02T00:00:00" not in f.read()
+    with open(main.habit_tracker.JOURNAL_FILE) as f:
+        assert "2021-01-02T00:00:00" in f.read()
+
+    reloaded = HabitTracker(main.config_manager)
+    assert iso_to_ts("2021-01-02T00:00:00") in reloaded.data["logs"]["Journaled"]
+
+def test_sqlite_backend(make_tracker):
+    """
+    Test that the SQLite backend stores habits and check-ins and answers
+    the indexed queries used by details/reminder/summary.
+    """
+    tracker = make_tracker(backend="sqlite")
+    tracker.add_habit("Workout", "daily")
+    tracker.check_habit("Workout", "2023-05-02")
+    tracker.check_habit("Workout", "2023-05-01")
+    assert tracker.storage.count_checkins("Workout") == 2
+    assert tracker.storage.last_checkin("Workout") == iso_to_ts("2023-05-02T00:00:00")
+
+    reopened = make_tracker(backend="sqlite")
+    assert reopened.storage.habits()["Workout"]["periodicity"] == "daily"
+    assert reopened.storage.total_checkins() == 2
+    reopened.delete_habit("Workout", "2023-05-01")
+    assert reopened.storage.count_checkins("Workout") == 1
+
+    # Opening a current database writes nothing, so reads don't wait for writers.
+    writer = sqlite3.connect(tracker.DB_FILE)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        reader = make_tracker(backend="sqlite")
+        assert reader.storage.total_checkins() == 1
+    finally:
+        writer.rollback()
+        writer.close()
+
+def test_config_rejects_unknown_backend():
+    result = runner.invoke(app, ["config", "--backend", "csv"])
+    assert result.exit_code == 1
+    assert "Unknown backend" in result.output
+
+def test_data_loaded_lazily(tmp_path, make_tracker):
+    """
+    Test that creating the tracker and running intro never reads the data or user files.
+    """
+    (tmp_path / "habits.json").write_text("{not valid json")
+    tracker = make_tracker(user=None)
+    tracker.intro()
+    assert tracker.storage._data is None
+    assert tracker._username is None
+
+def test_timings_flag_reports_phases():
+    runner.invoke(app, ["setup-user"], input="TestUser\n")
+    result = runner.invoke(app, ["--timings", "list_habits"])
+    assert result.exit_code == 0
+    for phase in ("imports", "config", "data load", "command", "total"):
+        assert phase in result.stderr
+
+def test_logs_stored_as_timestamps_and_saved_as_iso(tmp_path, make_tracker):
+    """
+    Test that check-ins are held as integer timestamps in memory
+    while the JSON snapshot keeps ISO-8601 strings.
+    """
+    tracker = make_tracker()
+    tracker.add_habit("Workout", "daily")
+    tracker.check_habit("Workout", "2023-05-01")
+    tracker.save_data()
+
+    logs = tracker.data["logs"]["Workout"]
+    assert logs.typecode == "q"
+    assert [ts_to_iso(ts) for ts in logs] == ["2023-05-01T00:00:00"]
+    assert '"2023-05-01T00:00:00"' in (tmp_path / "habits.json").read_text()
+
+def test_backdated_check_keeps_logs_sorted(tmp_path, make_tracker):
+    """
+    Test that a back-dated check does not become the latest check-in,
+    and that an unsorted snapshot is sorted once on load.
+    """
+    (tmp_path / "habits.json").write_text(
+        '{"habits": {"Read": {"periodicity": "daily", "created_at": "2023-01-01T00:00:00"}},'
+        ' "logs": {"Read": ["2023-05-03T00:00:00", "2023-05-01T00:00:00"]}}'
+    )
+    tracker = make_tracker()
+    tracker.check_habit("Read")
+    tracker.check_habit("Read", "2023-05-02")
+    logs = list(tracker.storage.logs("Read"))
+    assert logs == sorted(logs)
+    assert ("Read", "daily") not in tracker.get_pending_habits()
+
+    snapshot = (tmp_path / "habits.json").read_text()
+    assert snapshot.index("2023-05-01") < snapshot.index("2023-05-03")
+    reloaded = make_tracker()
+    assert [ts_to_iso(ts)[:10] for ts in reloaded.storage.logs("Read")][:3] == ["2023-05-01", "2023-05-02", "2023-05-03"]
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_streak_cache_updated_on_check_and_delete(backend, make_tracker):
+    """
+    Test that the cached streak record follows checks, back-dated checks
+    and removed checks, and survives a reload.
+    """
+    tracker = make_tracker(backend=backend)
+    tracker.add_habit("Run", "daily")
+    for day in ["2023-05-01", "2023-05-02", "2023-05-03", "2023-05-05"]:
+        tracker.check_habit("Run", day)
+    record = tracker.storage.streak_records()["Run"]
+    assert (record["current"], record["longest"]) == (1, 3)
+
+    tracker.check_habit("Run", "2023-05-04")
+    record = tracker.storage.streak_records()["Run"]
+    assert (record["current"], record["longest"]) == (5, 5)
+    assert ts_to_iso(record["start"]) == "2023-05-01T00:00:00"
+
+    tracker.delete_habit("Run", "2023-05-02")
+    tracker.save_data()
+    record = make_tracker(backend=backend).storage.streak_records()["Run"]
+    assert (record["current"], record["longest"]) == (3, 3)
+    assert ts_to_iso(record["last"]) == "2023-05-05T00:00:00"
+
+def test_caches_of_old_snapshots_are_persisted_once(tmp_path, make_tracker):
+    """
+    Test that a snapshot written before the streak and rollup caches existed
+    gets them saved on first load, so later commands don't rebuild them.
+    """
+    data_file = tmp_path / "habits.json"
+    data_file.write_text(json.dumps({
+        "habits": {"Run": {"periodicity": "daily", "created_at": "2023-01-01T00:00:00"}},
+        "logs": {"Run": ["2023-05-01T00:00:00", "2023-05-02T00:00:00"]}
+    }))
+    assert make_tracker().storage.streak_records()["Run"]["current"] == 2
+
+    snapshot = json.loads(data_file.read_text())
+    assert snapshot["streaks"]["Run"]["longest"] == 2
+    assert snapshot["rollups"]["Run"]["month"] == {"2023-05": 2}
+    inode = data_file.stat().st_ino
+    make_tracker().storage.load()
+    assert data_file.stat().st_ino == inode
+
+def test_sharded_writes_touch_one_shard_and_load_lazily(tmp_path, make_tracker):
+    """
+    Test that the sharded backend rewrites only the shard of the changed
+    habit, and that a fresh tracker reads shards only when logs are needed.
+    """
+    (tmp_path / "habits.json").write_text(json.dumps({
+        "habits": {"Seeded": {"periodicity": "weekly", "created_at": "2023-01-01T00:00:00"}},
+        "logs": {"Seeded": ["2023-01-02T00:00:00"]}
+    }))
+    tracker = make_tracker(backend="sharded")
+    for name in ["Walk", "Read/Write"]:
+        tracker.add_habit(name, "daily")
+        tracker.check_habit(name, "2023-05-01")
+
+    shards = tmp_path / "habits.shards"
+    assert len(list(shards.glob("*.json"))) == 4  # manifest + 3 shards
+    read_shard = tracker.storage.shard_path("Read/Write")
+    before = {p.name: p.stat().st_mtime_ns for p in shards.glob("*.json")}
+    time.sleep(0.01)
+    tracker.check_habit("Walk", "2023-05-02")
+    changed = {p.name for p in shards.glob("*.json") if p.stat().st_mtime_ns != before.get(p.name)}
+    assert changed == {"manifest.json", os.path.basename(tracker.storage.shard_path("Walk"))}
+
+    fresh = make_tracker(backend="sharded").storage
+    assert fresh.total_checkins() == 4 and fresh.count_checkins("Walk") == 2
+    assert fresh.streak_records()["Walk"]["current"] == 2
+    assert fresh.last_checkin("Seeded") == iso_to_ts("2023-01-02T00:00:00")
+    assert fresh._logs == {}
+    assert list(fresh.logs("Read/Write")) == [iso_to_ts("2023-05-01T00:00:00")]
+    assert list(fresh._logs) == ["Read/Write"]
+
+    fresh.apply({"op": "delete", "habit": "Read/Write"})
+    assert not os.path.exists(read_shard)
+    assert list(make_tracker(backend="sharded").storage.habits()) == ["Seeded", "Walk"]
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_writes_are_skipped_when_nothing_changed(tmp_path, backend, make_tracker):
+    """
+    Test that no-op deletes and resets and saves of unchanged data leave
+    every file alone, and that only the changed habits are marked dirty.
+    """
+    tracker = make_tracker(backend=backend)
+
+    def files():
+        return {p: (p.stat().st_ino, p.stat().st_size, p.stat().st_mtime_ns)
+                for p in tmp_path.rglob("*") if p.is_file() and not p.name.endswith(".lock")}
+
+    tracker.reset_all()
+    assert tracker.changes == 0
+    for name in ["Run", "Read"]:
+        tracker.add_habit(name, "daily")
+        tracker.check_habit(name, "2023-05-01")
+    assert tracker.changes == 4
+    tracker.save_data()
+    assert not tracker.storage.dirty
+
+    before = files()
+    time.sleep(0.01)
+    tracker.delete_habit("Run", "2023-06-01")
+    assert not tracker.save_data()
+    assert tracker.changes == 4 and files() == before
+
+    tracker.check_habit("Run", "2023-05-02")
+    # Only the json backend defers its snapshot; the others wrote already.
+    assert tracker.storage.dirty == ({"Run"} if backend == "json" else set())
+    tracker.save_data()
+    changed = {p.name for p, signature in files().items() if before.get(p) != signature}
+    if backend == "sharded":
+        assert changed == {"manifest.json", os.path.basename(tracker.storage.shard_path("Run"))}
+
+    tracker.reset_all()
+    assert tracker.changes == 6
+    before = files()
+    tracker.reset_all()
+    assert not tracker.save_data()
+    assert tracker.changes == 6 and files() == before
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_count_checkins_in_window(backend, make_tracker):
+    """
+    Test counting check-ins in half-open [start, end) timestamp windows.
+    """
+    tracker = make_tracker(backend=backend)
+    tracker.add_habit("Walk", "daily")
+    for day in ["2023-05-03", "2023-05-01", "2023-05-02", "2023-05-02", "2023-05-10"]:
+        tracker.check_habit("Walk", day)
+
+    count = tracker.storage.count_checkins
+    assert count("Walk") == 5
+    assert count("Walk", start=iso_to_ts("2023-05-02T00:00:00")) == 4
+    assert count("Walk", end=iso_to_ts("2023-05-02T00:00:00")) == 1
+    assert count("Walk", iso_to_ts("2023-05-02T00:00:00"), iso_to_ts("2023-05-04T00:00:00")) == 3
+    assert count("Walk", iso_to_ts("2023-05-11T00:00:00"), iso_to_ts("2023-05-04T00:00:00")) == 0
+    assert count("Missing", start=0) == 0
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_rollups_follow_writes_and_reloads(tmp_path, backend, capsys, make_tracker):
+    """
+    Test that day/week/month rollups are updated by checks, removed checks
+    and deletes, survive a reload, and are rebuilt for older snapshots.
+    """
+    tracker = make_tracker(backend=backend)
+    tracker.add_habit("Yoga", "daily")
+    tracker.add_habit("Chess", "weekly")
+    for day in ["2023-12-31", "2024-01-01", "2024-01-01", "2024-02-10"]:
+        tracker.check_habit("Yoga", day)
+    tracker.check_habit("Chess", "2024-01-01")
+    tracker.delete_habit("Yoga", "2024-02-10")
+    tracker.delete_habit("Chess")
+    tracker.save_data()
+
+    expected = {
+        "day": {"2023-12-31": 1, "2024-01-01": 2},
+        "week": {"2023-W52": 1, "2024-W01": 2},
+        "month": {"2023-12": 1, "2024-01": 2},
+    }
+    assert make_tracker(backend=backend).storage.rollup("Yoga") == expected
+    assert make_tracker(backend=backend).storage.rollup("Chess") == analytics.empty_rollup()
+    assert analytics.rollup_counts(expected, "year") == {"2023": 1, "2024": 2}
+
+    if backend == "json":
+        snapshot = json.loads((tmp_path / "habits.json").read_text())
+        del snapshot["rollups"]
+        (tmp_path / "habits.json").write_text(json.dumps(snapshot))
+        assert make_tracker(backend=backend).storage.rollup("Yoga") == expected
+
+    capsys.readouterr()
+    tracker.report("year", datetime.now().year - 2022, "Yoga")
+    output = capsys.readouterr().out
+    assert "1 (0%)" in output and "2 (1%)" in output
+
+def test_due_queue_orders_and_skips_stale_entries():
+    queue = analytics.DueQueue.build(
+        {"A": {"periodicity": "daily"}, "B": {"periodicity": "weekly"}, "C": {"periodicity": "daily"}},
+        {"A": {"last": 86400 * 10 + 5}, "B": {"last": 86400 * 2}}
+    )
+    assert queue.pending(0) == [("C", "daily")]
+    assert queue.pending(86400 * 11) == [("C", "daily"), ("B", "weekly"), ("A", "daily")]
+    queue.update("A", "daily", 86400 * 20)
+    queue.update("A", "daily", 86400 * 10)
+    queue.remove("C")
+    assert queue.pending(86400 * 11) == [("B", "weekly"), ("A", "daily")]
+    assert queue.next_due() == 86400 * 10
+    assert queue.next_due(after=86400 * 11) is None
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_pending_habits_follow_checks_and_watch_sleeps_until_due(backend, monkeypatch, capsys, make_tracker):
+    """
+    Test that the due queue follows checks and deletes, and that
+    `reminder --watch` sleeps exactly until the next habit falls due.
+    """
+    tracker = make_tracker(backend=backend)
+    today = datetime.now().date()
+    tracker.add_habit("Floss", "daily")
+    tracker.add_habit("Laundry", "weekly")
+    tracker.add_habit("Stretch", "daily")
+    tracker.check_habit("Floss", (today - timedelta(days=1)).isoformat())
+    tracker.check_habit("Laundry", (today - timedelta(days=3)).isoformat())
+    assert tracker.get_pending_habits() == [("Stretch", "daily"), ("Floss", "daily")]
+
+    tracker.check_habit("Floss")
+    tracker.delete_habit("Stretch")
+    assert tracker.get_pending_habits() == []
+
+    sleeps = []
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        raise KeyboardInterrupt
+    monkeypatch.setattr("main.time.sleep", fake_sleep)
+    tracker.WATCH_MAX_SLEEP = 10 ** 9
+    tracker.reminder(watch=True)
+
+    midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    assert abs(sleeps[0] - (midnight - datetime.now()).total_seconds()) < 5
+    assert "Stopped watching." in capsys.readouterr().out
+
+def reference_current_streak(period, logs):
+    """The original HabitTracker.streaks loop, on datetimes sorted newest first."""
+    sorted_logs = sorted([datetime.fromisoformat(ts_to_iso(ts)) for ts in logs], reverse=True)
+    streak = 1
+    prev_date = sorted_logs[0]
+    for log in sorted_logs[1:]:
+        diff = (prev_date - log).days
+        if period == "daily" and diff == 1:
+            streak += 1
+        elif period == "weekly" and diff <= 7:
+            streak += 1
+        else:
+            break
+        prev_date = log
+    return streak
+
+def test_numpy_streak_engine_matches_python():
+    """
+    Differential test of the NumPy streak engine against the pure-Python
+    engine and the original streak loop on random streaky histories.
+    """
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    base = iso_to_ts("2022-01-01T00:00:00")
+    habit_logs = {}
+    for i in range(200):
+        period = rng.choice(["daily", "weekly", "monthly"])
+        day, logs = 0, []
+        for _ in range(rng.randint(0, 60)):
+            day += rng.choice([0, 1, 1, 1, 2, 6, 7, 8])
+            logs.append(base + day * 86400 + rng.randint(0, 86399))
+        habit_logs[f"habit{i}"] = (period, array("q", sorted(logs)))
+
+    expected = analytics.compute_streaks_python(habit_logs)
+    assert analytics.compute_streaks_numpy(habit_logs) == expected
+    for name, record in expected.items():
+        period, logs = habit_logs[name]
+        assert record["current"] == reference_current_streak(period, logs)
+
+def test_check_batch_range_and_stdin(monkeypatch):
+    """
+    Test `check-batch` with a date range for several habits and with
+    'habit,date' lines read from stdin, each applied with a single save.
+    """
+    runner.invoke(app, ["setup-user"], input="Tester\n")
+    runner.invoke(app, ["add", "BatchA", "daily"])
+    runner.invoke(app, ["add", "BatchB", "weekly"])
+    saves = []
+    monkeypatch.setattr(main.habit_tracker.storage, "save", lambda: saves.append(1))
+
+    result = runner.invoke(app, ["check-batch", "BatchA", "BatchB", "--from", "2022-03-01", "--to", "2022-03-10"])
+    assert result.exit_code == 0
+    assert "Checked off 20 check-ins across 2 habits." in result.output
+    assert main.habit_tracker.storage.count_checkins("BatchA") == 10
+    assert len(saves) == 1
+
+    result = runner.invoke(app, ["check-batch", "--file", "-"], input="BatchA,2022-04-01\nMissing,2022-04-01\nBatchB,bad\n")
+    assert result.exit_code == 0
+    assert "Habit 'Missing' not found!" in result.output
+    assert "invalid date 'bad'" in result.output
+    assert "Checked off 1 check-ins across 1 habits." in result.output
+    assert len(saves) == 2
+
+    for args in (["BatchA", "--to", "2022-03-10"], ["--file", "-", "--from", "2022-03-01"]):
+        result = runner.invoke(app, ["check-batch"] + args, input="BatchA,2022-05-01\n")
+        assert "--from" in result.output
+    assert len(saves) == 2 and main.habit_tracker.storage.count_checkins("BatchA") == 11
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_export_import_roundtrip(tmp_path, fmt, backend, make_tracker):
+    """
+    Test that exported check-ins import into an empty tracker unchanged,
+    recreating the habits with their periodicity.
+    """
+    source = make_tracker(tmp_path / "src")
+    source.add_habit("Run", "daily")
+    source.add_habit("Bills", "weekly")
+    source.check_batch(["Run"], "2023-01-01", "2023-01-05")
+    source.check_habit("Bills", "2023-01-02")
+    export_file = tmp_path / f"history.{fmt}"
+    source.export_checkins(str(export_file))
+
+    target = make_tracker(tmp_path / "dst", backend=backend)
+    target.import_checkins(str(export_file))
+    assert target.storage.habits()["Bills"]["periodicity"] == "weekly"
+    assert list(target.storage.logs("Run")) == list(source.storage.logs("Run"))
+    assert target.storage.streak_records()["Run"]["current"] == 5
+
+def test_binary_snapshot_maps_logs_and_converts_both_ways(tmp_path, make_tracker):
+    """
+    Test converting the json backend to the binary snapshot format and back,
+    that loaded logs are views of the file until written to, and that the
+    journal works on top of a binary snapshot.
+    """
+    tracker = make_tracker()
+    cm = tracker.config
+    tracker.add_habit("Run", "daily")
+    tracker.add_habit("Idle", "weekly")
+    for day in ["2023-05-01", "2023-05-02", "2023-05-03"]:
+        tracker.check_habit("Run", day)
+
+    tracker.convert_data("binary")
+    assert cm.config_data["format"] == "binary"
+    assert (tmp_path / "habits.bin").read_bytes().startswith(b"HCLIBIN")
+
+    binary = HabitTracker(cm)
+    logs = binary.storage.logs("Run")
+    assert isinstance(logs, memoryview) == (sys.byteorder == "little")
+    assert list(logs) == [iso_to_ts(f"2023-05-0{d}T00:00:00") for d in (1, 2, 3)]
+    assert binary.storage.streak_records()["Run"]["current"] == 3
+    assert len(binary.storage.logs("Idle")) == 0
+
+    binary.check_habit("Run", "2023-04-30")
+    binary.delete_habit("Run", "2023-05-02")
+    assert (tmp_path / "habits.bin.journal").exists()
+    reloaded = HabitTracker(cm).storage
+    assert [ts_to_iso(ts)[:10] for ts in reloaded.logs("Run")] == ["2023-04-30", "2023-05-01", "2023-05-03"]
+    reloaded.save()
+    assert list(HabitTracker(cm).storage.logs("Run")) == list(reloaded.logs("Run"))
+
+    back = HabitTracker(cm)
+    back.convert_data("json")
+    assert cm.config_data["format"] == "json"
+    assert json.loads((tmp_path / "habits.json").read_text())["logs"]["Run"][0] == "2023-04-30T00:00:00"
+    assert HabitTracker(cm).storage.count_checkins("Run") == 3
+
+    # The old format's files are removed, so switching back never loads stale data.
+    assert not (tmp_path / "habits.bin").exists() and not (tmp_path / "habits.bin.journal").exists()
+    back.check_habit("Run", "2023-05-04")
+    back.check_habit("Run", "2023-05-05")
+    HabitTracker(cm).convert_data("binary")
+    assert not (tmp_path / "habits.json").exists()
+    assert HabitTracker(cm).storage.count_checkins("Run") == 5
+
+    with pytest.raises(ValueError):
+        cm.set_format("csv")
+
+def test_binary_read_path_decodes_only_touched_habits(capsys, make_tracker):
+    """
+    Test that read-only commands on a binary snapshot leave the logs mapped
+    and parse only the rollups they use, and that saving copies undecoded
+    rollups over unchanged.
+    """
+    tracker = make_tracker(format="binary")
+    tracker.fill_data(habits=4, days=60, seed=3)
+
+    reader = make_tracker(format="binary")
+    reader.streaks()
+    reader.summary()
+    reader.details("Workout")
+    reader.dashboard(ascii_mode=True)
+    rollups = reader.storage.data["rollups"]
+    assert all(rollups.is_raw(name) for name in reader.storage.habits())
+    assert all(not isinstance(logs, array) for logs in reader.storage.data["logs"].values()) \
+        or sys.byteorder != "little"
+
+    assert sum(reader.storage.rollup("ReadBook")["day"].values()) == reader.storage.count_checkins("ReadBook")
+    assert not rollups.is_raw("ReadBook") and rollups.is_raw("Workout")
+    reader.storage.save()
+    assert make_tracker(format="binary").storage.rollup("Workout") == tracker.storage.rollup("Workout")
+
+    # A rollup that doesn't match its logs is rebuilt on load.
+    tampered = make_tracker(format="binary").storage
+    tampered.data["rollups"]["Workout"] = analytics.empty_rollup()
+    tampered.data["rollups"]["Workout"]["month"]["1999-01"] = 1
+    tampered.save()
+    assert make_tracker(format="binary").storage.rollup("Workout") == tracker.storage.rollup("Workout")
+    capsys.readouterr()
+
+@pytest.mark.parametrize("name", codec.available())
+def test_json_codecs_agree_and_pretty_printing_is_opt_in(tmp_path, name, make_tracker):
+    """
+    Test that every installed JSON codec writes the same compact bytes, and
+    that data and user files are only indented with pretty_json.
+    """
+    obj = {"habits": {"Läufe": {"periodicity": "daily"}}, "logs": [1, 2], "n": None}
+    try:
+        assert codec.use(name) == name
+        assert codec.dumps(obj) == '{"habits":{"Läufe":{"periodicity":"daily"}},"logs":[1,2],"n":null}'.encode()
+        assert codec.loads(memoryview(codec.dumps(obj, pretty=True))) == obj
+        with pytest.raises(ValueError):
+            codec.loads(b'{"habits": ')
+
+        tracker = make_tracker()
+        tracker.add_habit("Run", "daily")
+        tracker.save_data()
+        assert "\n" not in (tmp_path / "habits.json").read_text()
+
+        tracker = make_tracker(pretty_json=True)
+        tracker.save_user("Tester")
+        tracker.storage.save()
+        assert (tmp_path / "habits.json").read_text().startswith('{\n  "habits": {')
+        assert (tmp_path / "user.json").read_text() == '{\n  "username": "Tester"\n}'
+    finally:
+        codec.use()
+
+def test_save_is_atomic_and_unreadable_data_is_never_overwritten(tmp_path, monkeypatch, make_tracker):
+    """
+    Test that saves keep the file mode, that a failed save leaves the
+    previous snapshot intact, that a corrupt snapshot is recovered from the rotating backup, and that
+    without a backup it is never replaced by an empty dataset.
+    """
+    data_file = tmp_path / "habits.json"
+    tracker = make_tracker(backups=2)
+    tracker.add_habit("Run", "daily")
+    tracker.save_data()
+    if os.name == "posix":
+        # New files follow the umask, replaced ones keep their mode.
+        umask = os.umask(0)
+        os.umask(umask)
+        assert data_file.stat().st_mode & 0o777 == 0o666 & ~umask
+        data_file.chmod(0o640)
+    tracker.check_habit("Run", "2023-05-01")
+    tracker.save_data()
+    if os.name == "posix":
+        assert data_file.stat().st_mode & 0o777 == 0o640
+    before = data_file.read_text()
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr("codec.dump", crash)
+    with pytest.raises(KeyboardInterrupt):
+        tracker.storage.save()
+    monkeypatch.undo()
+    assert data_file.read_text() == before
+    assert not list(tmp_path.glob("*.tmp"))
+
+    data_file.write_text('{"habits": {"Run"')
+    recovered = make_tracker(backups=2)
+    assert "Run" in recovered.storage.habits()
+    recovered.check_habit("Run", "2023-05-02")
+    recovered.storage.save()
+    # The corrupt file is kept aside instead of being rotated over the backup.
+    assert (tmp_path / "habits.json.corrupt").read_text() == '{"habits": {"Run"'
+    assert "Run" in json.loads((tmp_path / "habits.json.1").read_text())["habits"]
+    data_file.write_text('{"habits": {"Run"')
+
+    broken = make_tracker(backups=0)
+    broken.add_habit("Other", "daily")
+    broken.save_data()
+    assert data_file.read_text() == '{"habits": {"Run"'
+
+@pytest.mark.parametrize("backend", ["json", "sharded"])
+def test_writes_to_unreadable_data_are_refused(tmp_path, backend, capsys, make_tracker):
+    """
+    Test that while the data file is corrupt every write is refused rather
+    than journaled, so nothing is silently dropped once it is repaired.
+    """
+    tracker = make_tracker(backend=backend)
+    tracker.add_habit("Run", "daily")
+    tracker.check_habit("Run", "2023-05-01")
+    tracker.storage.save()
+    data_file = tmp_path / ("habits.json" if backend == "json" else "habits.shards/manifest.json")
+    good = data_file.read_bytes()
+    capsys.readouterr()
+
+    data_file.write_text('{"habits": {"Run"')
+    broken = make_tracker(backend=backend)
+    broken.add_habit("Other", "daily")
+    broken.fill_data(habits=2, days=5, seed=1)
+    output = " ".join(capsys.readouterr().out.split())
+    assert output.count("could not be read. Repair or remove it first.") == 2 and "successfully" not in output
+    with pytest.raises(ReadOnlyError):
+        broken.storage.apply({"op": "check", "habit": "Run", "at": "2023-05-02T00:00:00"})
+    assert not (tmp_path / "habits.json.journal").exists()
+
+    data_file.write_bytes(good)
+    repaired = make_tracker(backend=backend).storage
+    assert list(repaired.habits()) == ["Run"] and repaired.count_checkins("Run") == 1
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_parallel_checks_lose_no_updates(tmp_path, backend, make_tracker):
+    """
+    Stress test: fire many `check` and `check-batch` processes at once
+    (journal appends and full snapshot saves racing each other) and
+    assert that every single check-in was persisted.
+    """
+    processes = int(os.environ.get("HCLI_STRESS_PROCESSES", "200"))
+    (tmp_path / "config.json").write_text(json.dumps({"rootPath": str(tmp_path), "backend": backend}))
+    subprocess.run([sys.executable, MAIN_PY, "add", "Stress", "daily"], cwd=tmp_path, check=True)
+
+    procs = []
+    for i in range(processes):
+        if i % 4 == 0:
+            day = (datetime(2020, 1, 1) + timedelta(days=i)).strftime("%Y-%m-%d")
+            args = ["check-batch", "Stress", "--from", day, "--to", day]
+        else:
+            args = ["check", "Stress"]
+        procs.append(subprocess.Popen(
+            [sys.executable, MAIN_PY] + args, cwd=tmp_path,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+    for p in procs:
+        assert p.wait() == 0
+
+    assert make_tracker(backend=backend).storage.count_checkins("Stress") == processes
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_parallel_first_runs_import_the_seed_once(tmp_path, backend, make_tracker):
+    """
+    Test that processes opening a new database or manifest at the same time
+    import the existing JSON data exactly once.
+    """
+    (tmp_path / "config.json").write_text(json.dumps({"rootPath": str(tmp_path), "backend": "json"}))
+    subprocess.run([sys.executable, MAIN_PY, "add", "Stress", "daily"], cwd=tmp_path, check=True)
+    subprocess.run(
+        [sys.executable, MAIN_PY, "check-batch", "Stress", "--from", "2020-01-01", "--to", "2020-01-10"],
+        cwd=tmp_path, check=True, stdout=subprocess.DEVNULL
+    )
+
+    (tmp_path / "config.json").write_text(json.dumps({"rootPath": str(tmp_path), "backend": backend}))
+    procs = [
+        subprocess.Popen([sys.executable, MAIN_PY, "check", "Stress"], cwd=tmp_path,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(8)
+    ]
+    for p in procs:
+        assert p.wait() == 0
+
+    assert make_tracker(backend=backend).storage.count_checkins("Stress") == 10 + 8
+
+@pytest.mark.skipif(not hasattr(__import__("socket"), "AF_UNIX"), reason="needs Unix domain sockets")
+def test_serve_answers_forwarded_commands(tmp_path, monkeypatch):
+    """
+    Test that a running `serve` daemon answers forwarded commands and keeps
+    its resident data in sync with what it writes.
+    """
+    (tmp_path / "config.json").write_text(json.dumps({"rootPath": str(tmp_path)}))
+    monkeypatch.chdir(tmp_path)
+    # Without a user the daemon refuses to start instead of prompting later.
+    result = subprocess.run([sys.executable, MAIN_PY, "serve"], cwd=tmp_path, stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 1 and "No user set up" in result.stdout
+    assert not (tmp_path / daemon.SOCKET_NAME).exists()
+
+    (tmp_path / "user.json").write_text('{"username": "Tester"}')
+    server = subprocess.Popen([sys.executable, MAIN_PY, "serve"], cwd=tmp_path, stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            if (tmp_path / daemon.SOCKET_NAME).exists():
+                break
+            time.sleep(0.05)
+
+        output, exit_code = daemon.forward(["add", "Served", "daily"])
+        assert exit_code == 0
+        assert "Habit 'Served' (daily) added successfully!" in output
+        output, exit_code = daemon.forward(["check", "Served", "--date", "2023-05-01"])
+        assert "Checked off 'Served' (daily) on 2023-05-01T00:00:00" in output
+        output, exit_code = daemon.forward(["details", "Served"])
+        assert "Total check-ins so far: 1" in output
+        assert daemon.forward(["config", "--show"]) is None
+
+        # A forwarded command never prompts, even once the user file is gone.
+        os.remove(tmp_path / "user.json")
+        output, exit_code = daemon.forward(["list_habits"])
+        assert exit_code == 0 and "Served" in output
+
+        result = subprocess.run([sys.executable, MAIN_PY, "details", "Missing"], cwd=tmp_path, capture_output=True, text=True)
+        assert "Habit 'Missing' not found!" in result.stdout
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=10)
+    assert not (tmp_path / daemon.SOCKET_NAME).exists()
+    assert daemon.forward(["details", "Served"]) is None
+
+async def http_request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "sharded"])
+def test_http_api_serves_json_and_writes_behind(tmp_path, backend, make_tracker):
+    """
+    Test the JSON endpoints of the HTTP API, and that writes are visible
+    at once but only persisted when the write-behind buffer is flushed.
+    """
+    api = HabitAPI(make_tracker(backend=backend), flush_interval=60)
+
+    async def scenario():
+        started = asyncio.get_running_loop().create_future()
+        server = asyncio.ensure_future(api.serve(port=0, ready=started.set_result))
+        port = (await started).sockets[0].getsockname()[1]
+
+        assert await http_request(port, "POST", "/habits", {"name": "Swim", "periodicity": "daily"}) == \
+            (201, {"name": "Swim", "periodicity": "daily"})
+        status, _ = await http_request(port, "POST", "/habits", {"name": "Swim", "periodicity": "daily"})
+        assert status == 409
+        for day in ["2023-05-01", "2023-05-02"]:
+            status, _ = await http_request(port, "POST", "/habits/Swim/check", {"date": day})
+            assert status == 201
+        assert (await http_request(port, "POST", "/habits/Nope/check"))[0] == 404
+
+        # Nothing has been persisted yet.
+        if backend == "json":
+            assert not (tmp_path / "habits.json.journal").exists()
+        elif backend == "sharded":
+            assert not (tmp_path / "habits.shards" / "manifest.json").exists()
+        else:
+            assert len(api.storage.pending) == 3
+            with sqlite3.connect(tmp_path / "habits.db") as db:
+                assert db.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 0
+
+        status, details = await http_request(port, "GET", "/habits/Swim")
+        assert (details["total_checkins"], details["last_checkin"]) == (2, "2023-05-02T00:00:00")
+        _, streaks = await http_request(port, "GET", "/streaks")
+        assert streaks["streaks"] == [{"name": "Swim", "periodicity": "daily", "current": 2, "longest": 2}]
+        _, summary = await http_request(port, "GET", "/summary")
+        assert summary["total_checkins"] == 2 and summary["daily_habits"] == ["Swim"]
+        _, reminder = await http_request(port, "GET", "/reminder")
+        assert reminder["pending"] == [{"name": "Swim", "periodicity": "daily"}]
+        if backend == "sqlite":
+            # Reads overlay the buffered writes instead of committing them.
+            assert len(api.storage.pending) == 3
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+
+    asyncio.run(scenario())
+    assert make_tracker(backend=backend).storage.count_checkins("Swim") == 2
+
+def test_http_api_waits_for_cli_writers_off_the_event_loop(make_tracker):
+    """
+    Test that unflushed SQLite write-behind writes hold no database lock, so
+    a concurrent CLI write goes through, and that an API write waiting for
+    the CLI's lock doesn't stall the event loop.
+    """
+    cli = make_tracker(backend="sqlite")
+    cli.add_habit("Swim", "daily")
+    api = HabitAPI(make_tracker(backend="sqlite"), flush_interval=60)
+
+    async def scenario():
+        started = asyncio.get_running_loop().create_future()
+        server = asyncio.ensure_future(api.serve(port=0, ready=started.set_result))
+        port = (await started).sockets[0].getsockname()[1]
+        assert (await http_request(port, "POST", "/habits/Swim/check", {"date": "2023-05-01"}))[0] == 201
+
+        with cli.storage.transaction():
+            cli.storage.conn.execute("PRAGMA busy_timeout = 100")
+            cli.check_habit("Swim", "2023-05-02")
+            request = asyncio.ensure_future(http_request(port, "POST", "/habits/Swim/check", {"date": "2023-05-03"}))
+            # The loop keeps running while the request waits for our lock.
+            await asyncio.sleep(0.1)
+            assert not request.done()
+        assert (await request)[0] == 201
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+
+    asyncio.run(scenario())
+    assert make_tracker(backend="sqlite").storage.count_checkins("Swim") == 3
+
+@pytest.mark.parametrize("chart", ["bars", "heatmap", "timeline"])
+def test_dashboard_renders_headless_and_caches_by_data_version(tmp_path, chart, capsys, make_tracker):
+    """
+    Test that `dashboard --output` renders PNG/SVG files without a display,
+    serves repeated requests from the cache and re-renders after a change.
+    """
+    pytest.importorskip("matplotlib")
+    tracker = make_tracker()
+    tracker.add_habit("Paint", "daily")
+    for day in ["2023-05-01", "2023-05-02", "2023-05-04"]:
+        tracker.check_habit("Paint", day)
+
+    png, svg = tmp_path / "out.png", tmp_path / "out.svg"
+    tracker.dashboard(output=str(png), chart=chart)
+    assert png.read_bytes().startswith(b"\x89PNG")
+    tracker.dashboard(output=str(svg), chart=chart)
+    assert b"<svg" in svg.read_bytes()
+    assert "(cached)" not in capsys.readouterr().out
+
+    tracker.dashboard(output=str(png), chart=chart)
+    assert "(cached)" in capsys.readouterr().out
+
+    tracker.check_habit("Paint", "2023-05-05")
+    capsys.readouterr()
+    tracker.dashboard(output=str(png), chart=chart)
+    assert "(cached)" not in capsys.readouterr().out
+    assert len(os.listdir(tracker.CHART_CACHE_DIR)) == 2
+
+def test_benchmark_suite_writes_json_results(tmp_path, monkeypatch):
+    """Smoke test: the benchmark suite runs at a tiny size and emits JSON results."""
+    suite = os.path.join(os.path.dirname(MAIN_PY), "benchmarks", "suite.py")
+    out = tmp_path / "results.json"
+    subprocess.run(
+        [sys.executable, suite, "--sizes", "10", "--repeat", "1", "--json", str(out)],
+        cwd=tmp_path, check=True, stdout=subprocess.DEVNULL
+    )
+    results = json.loads(out.read_text())["results"]
+    assert {r["op"] for r in results} >= {"load_data", "save_data", "check_habit", "streaks",
+                                          "summary", "get_pending_habits", "dashboard_ascii"}
+    assert {r["backend"] for r in results} == {"json", "sqlite", "sharded"}
+    assert not (tmp_path / "config.json").exists()
+
+    # The timed check really checks in (it once timed a "not found" message).
+    spec = importlib.util.spec_from_file_location("suite", suite)
+    bench = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench)
+    root = tmp_path / "checked"
+    root.mkdir()
+    # Settings of a config.json where the suite runs don't leak into it.
+    (tmp_path / "config.json").write_text('{"format": "binary", "backups": 2, "pretty_json": true}')
+    monkeypatch.chdir(tmp_path)
+    cm, _ = bench.make_tracker(str(root), "json", 100)
+    setup, call = bench.OPERATIONS["check_habit"]
+    tracker = setup(cm)
+    before = tracker.storage.count_checkins(bench.CHECKED_HABIT)
+    call(tracker)
+    assert bench.fresh(cm).storage.count_checkins(bench.CHECKED_HABIT) == before + 1
+    tracker.storage.save()
+    assert sorted(os.listdir(root)) == ["habits.json", "habits.json.lock", "user.json"]
+    assert "\n" not in (root / "habits.json").read_text()